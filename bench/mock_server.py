@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+dshs.app 대신 쓰는 로컬 서버
+Client가 쓰는 엔드포인트(token, userinfo, meals, penalties, outrequests, spaces/*, reservations/*, 자습실 이미지)를
+지연 시간, 오류 비율, 응답 크기를 바꿔 가며 흉내 냄
+
+사용법: python bench/mock_server.py [-p 포트] [--latency ms] [--error-rate 비율] ...
+dshs는 DSHS_BASE_ADDRESS=http://127.0.0.1:포트 환경 변수로 연결함
+
+/_stats는 경로별 요청 수, /_reset은 요청 수와 신청/외출 기록 초기화
+"""
+import argparse
+import json
+import random
+import re
+import struct
+import threading
+import zlib
+from datetime import datetime
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+from urllib.parse import parse_qs, urlparse
+
+names = ["홍길동", "김철수", "이영희", "박지민", "최유진", "정하늘"]
+rooms = {"a": "자습실 A", "b": "자습실 B", "s": "세미나실"}
+
+
+class MockState:
+    """응답 크기 설정과 요청 수, 신청/외출 기록"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, areas=3, tables=4, rows=2, cols=4, fill=0.5, penalties=20, meal_size=40, image_size=1600, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.areas = areas
+        self.tables = tables
+        self.rows = rows
+        self.cols = cols
+        self.fill = fill
+        self.penalties = penalties
+        self.meal_size = meal_size
+        self.image_size = image_size
+        self._image = None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = {}
+            self.reservations = {}  # (날짜, 좌석): 학번
+            self.outrequests = []
+
+    def count(self, path):
+        with self.lock:
+            self.counts[path] = self.counts.get(path, 0) + 1
+
+    def delay(self):
+        with self.lock:
+            extra = self.random.uniform(0, self.jitter) if self.jitter else 0
+        sleep((self.latency + extra) / 1000)
+
+    def fail(self):
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def seats(self, area):
+        per_table = self.rows * self.cols
+        return [
+            [f"{area}{t * per_table + i + 1:02d}" for i in range(per_table)]
+            for t in range(self.tables)
+        ]
+
+    def area_layout(self, area):
+        seats = self.seats(area)
+        return {
+            "tables": [{"r": self.rows, "c": self.cols, "data": data} for data in seats],
+            "vertical": False,
+            "count": sum(len(d) for d in seats),
+        }
+
+    def area_reservations(self, date, area):
+        """fill 비율만큼 날짜/구역마다 같은 좌석이 차 있고, 신청한 좌석이 더해짐"""
+        rng = random.Random(f"{date}{area}")
+        seats = []
+        for data in self.seats(area):
+            for i, seat in enumerate(data):
+                student_id = self.reservations.get((date, seat))
+                if student_id is None and rng.random() < self.fill:
+                    student_id = f"2{rng.randrange(1, 4)}{rng.randrange(0, 100):02d}"
+                if student_id is not None:
+                    seats.append(
+                        {
+                            "seat_name": seat,
+                            "user": {"student_id": student_id, "name": names[int(student_id) % len(names)]},
+                        }
+                    )
+        return {"occupied": len(seats), "seats": seats}
+
+    def image(self):
+        """image_size x image_size/2 크기의 줄무늬 PNG"""
+        if self._image is None:
+            width, height = self.image_size, self.image_size // 2
+            row = b"".join(
+                bytes([40, 40, 40]) if (x // 32) % 2 else bytes([230, 230, 230]) for x in range(width)
+            )
+            raw = b"".join(b"\0" + row for _ in range(height))
+
+            def chunk(kind, data):
+                return (
+                    struct.pack(">I", len(data))
+                    + kind
+                    + data
+                    + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+                )
+
+            self._image = (
+                b"\x89PNG\r\n\x1a\n"
+                + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+                + chunk(b"IDAT", zlib.compress(raw))
+                + chunk(b"IEND", b"")
+            )
+        return self._image
+
+    def penalty_records(self):
+        rng = random.Random("penalties")
+        records = []
+        for i in range(self.penalties):
+            records.append(
+                {
+                    "id": i + 1,
+                    "date": f"2026-{rng.randrange(3, 13):02d}-{rng.randrange(1, 29):02d}T0{rng.randrange(0, 10)}:00:00Z",
+                    "points": rng.choice([1, 2, 3, 5, -1, -2]),
+                    "reason": rng.choice(["지각", "소음", "무단 이탈", "봉사"]),
+                    "giver": {"name": rng.choice(names) + " 선생님"},
+                }
+            )
+        return records
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, code, obj=None, headers=None):
+        body = b"" if obj is None else json.dumps(obj, ensure_ascii=False).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def cached(self, obj, tag):
+        etag = f'"{tag}"'
+        if self.headers.get("If-None-Match") == etag:
+            return self.send(304, None, {"ETag": etag})
+        return self.send(200, obj, {"ETag": etag})
+
+    def form(self):
+        size = int(self.headers.get("Content-Length") or 0)
+        return {k: v[0] for k, v in parse_qs(self.rfile.read(size).decode()).items()}
+
+    def handle_method(self, method):
+        url = urlparse(self.path)
+        path = url.path
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        state = self.state
+        if path == "/_stats":
+            return self.send(200, state.counts)
+        if path == "/_reset":
+            state.reset()
+            return self.send(200, {})
+        state.count(f"{method} {re.sub(r'/[0-9]{8}', '/{date}', path)}")
+        state.delay()
+        body = self.form() if method in ["POST", "PUT", "DELETE"] else {}
+        if method == "HEAD" or path == "/":
+            return self.send(200, None, {"Date": formatdate(usegmt=True)})
+        if state.fail():
+            return self.send(500, {"error": "mock error"})
+        if re.match(r"^/[abs]_labeled\.png$", path):
+            etag = f'"image-{state.image_size}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self.send(304, None, {"ETag": etag})
+            body = state.image()
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return self.wfile.write(body)
+        path = path.replace("/api/v1/", "/")
+        if path == "/token":
+            return self.send(200, {"access_token": "mock-token"})
+        if path == "/userinfo":
+            return self.send(200, {"student_id": "2301", "name": "홍길동", "alias": None})
+        m = re.match(r"^/meals/(\d{8})$", path)
+        if m:
+            if datetime.strptime(m.group(1), "%Y%m%d").weekday() == 6:
+                return self.send(404, {})
+            filler = "·" * max(0, state.meal_size - 4)
+            return self.send(200, [f"아침 {filler}", f"점심 {filler}", f"저녁 {filler}"])
+        if path == "/penalties":
+            records = state.penalty_records()
+            if query.get("from"):
+                f = datetime.strptime(query["from"], "%Y%m%d").strftime("%Y-%m-%d")
+                records = [r for r in records if r["date"][:10] >= f]
+            if query.get("to"):
+                t = datetime.strptime(query["to"], "%Y%m%d").strftime("%Y-%m-%d")
+                records = [r for r in records if r["date"][:10] <= t]
+            return self.send(200, {"total": sum(r["points"] for r in state.penalty_records()), "data": records})
+        if path == "/outrequests":
+            if method == "POST":
+                if not body.get("from") or not body.get("to"):
+                    return self.send(400, {"error": "invalid format"})
+                with state.lock:
+                    state.outrequests.append(
+                        {
+                            "id": len(state.outrequests) + 1,
+                            "from": body["from"],
+                            "to": body["to"],
+                            "category": body.get("category"),
+                            "reason": body.get("reason"),
+                            "status": "대기",
+                        }
+                    )
+                return self.send(200, {"ok": True})
+            records = state.outrequests
+            if query.get("from"):
+                f = datetime.strptime(query["from"], "%Y%m%d").strftime("%Y-%m-%d")
+                records = [r for r in records if r["from"][:10] >= f]
+            return self.send(200, records)
+        m = re.match(r"^/spaces/rooms/([abs])$", path)
+        if m:
+            room = m.group(1)
+            return self.cached(
+                {
+                    "description": rooms[room],
+                    "areas": [
+                        {"area_name": f"{room}{i + 1}", "count": state.tables * state.rows * state.cols}
+                        for i in range(state.areas)
+                    ],
+                },
+                f"room-{room}-{state.areas}-{state.tables}-{state.rows}-{state.cols}",
+            )
+        m = re.match(r"^/spaces/areas/([abs]\d)$", path)
+        if m:
+            return self.cached(
+                state.area_layout(m.group(1)),
+                f"area-{m.group(1)}-{state.tables}-{state.rows}-{state.cols}",
+            )
+        m = re.match(r"^/reservations/(\d{8})/rooms/([abs])$", path)
+        if m:
+            date, room = m.groups()
+            return self.send(
+                200,
+                {
+                    "areas": [
+                        {"occupied": state.area_reservations(date, f"{room}{i + 1}")["occupied"]}
+                        for i in range(state.areas)
+                    ]
+                },
+            )
+        m = re.match(r"^/reservations/(\d{8})/areas/([abs]\d)$", path)
+        if m:
+            return self.send(200, state.area_reservations(*m.groups()))
+        m = re.match(r"^/reservations/(\d{8})/search$", path)
+        if m:
+            q = query.get("q", "")
+            student_id = "2301" if q in ["me", "홍길동"] else q
+            if not re.match(r"^[1-3]\d{3}$", student_id):
+                return self.send(404, {})
+            seat = next(
+                (s for (d, s), sid in state.reservations.items() if d == m.group(1) and sid == student_id),
+                None,
+            )
+            return self.send(
+                200,
+                {"user": {"student_id": student_id, "name": names[int(student_id) % len(names)]}, "seat_name": seat},
+            )
+        m = re.match(r"^/reservations/(\d{8})$", path)
+        if m and method == "POST":
+            date, seat = m.group(1), body.get("seat_name", "")
+            occupied = {s["seat_name"] for s in state.area_reservations(date, seat[:2])["seats"]}
+            if seat in occupied:
+                return self.send(406, {"error": "이미 신청된 좌석"})
+            with state.lock:
+                state.reservations[(date, seat)] = "2301"
+            return self.send(200, {"ok": True})
+        return self.send(404, {})
+
+    def do_GET(self):
+        self.handle_method("GET")
+
+    def do_HEAD(self):
+        self.handle_method("HEAD")
+
+    def do_POST(self):
+        self.handle_method("POST")
+
+    def do_PUT(self):
+        self.handle_method("PUT")
+
+    def do_DELETE(self):
+        self.handle_method("DELETE")
+
+
+def start(state, port=0):
+    """백그라운드 스레드에서 서버를 시작하고 (서버, 주소)를 반환함"""
+    handler = type("BoundHandler", (Handler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def add_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0, help="응답 지연(ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="응답 지연에 더할 무작위 지연의 최댓값(ms)")
+    parser.add_argument("--error-rate", type=float, default=0, help="500 오류를 돌려줄 비율(0~1)")
+    parser.add_argument("--areas", type=int, default=3, help="자습실마다 구역 수")
+    parser.add_argument("--tables", type=int, default=4, help="구역마다 테이블 수")
+    parser.add_argument("--rows", type=int, default=2, help="테이블 행 수")
+    parser.add_argument("--cols", type=int, default=4, help="테이블 열 수")
+    parser.add_argument("--fill", type=float, default=0.5, help="차 있는 좌석 비율(0~1)")
+    parser.add_argument("--penalties", type=int, default=20, help="벌점 기록 수")
+    parser.add_argument("--meal-size", type=int, default=40, help="급식 한 끼의 글자 수")
+    parser.add_argument("--image-size", type=int, default=1600, help="자습실 이미지 폭(px)")
+
+
+def state_from(args):
+    return MockState(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        areas=args.areas,
+        tables=args.tables,
+        rows=args.rows,
+        cols=args.cols,
+        fill=args.fill,
+        penalties=args.penalties,
+        meal_size=args.meal_size,
+        image_size=args.image_size,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 dshs.app 흉내 서버")
+    parser.add_argument("-p", "--port", type=int, default=8765, help="포트")
+    add_arguments(parser)
+    args = parser.parse_args()
+    server, address = start(state_from(args), args.port)
+    print(f"{address} 에서 실행 중 (CTRL+C로 종료)")
+    print(f"DSHS_BASE_ADDRESS={address} dshs ...")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
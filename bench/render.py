@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+큰 가상 구역으로 좌석표 렌더링 시간 측정
+예전 print_table의 문자열 replace 방식과 dshs.join_horizontal을 비교함
+
+사용법: python bench/render.py [-t 테이블 수] [-r 행] [-c 열] [-n 반복 횟수]
+"""
+import argparse
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import dshs  # noqa: E402
+
+names = ["홍길동", "김철수", "이영희", "박지민", "최유진", "정하늘"]
+
+
+def synthetic_area(tables, r, c):
+    """좌석 절반이 한글 이름으로 차 있는 구역 배치와 예약 현황"""
+    layout = {"tables": [], "vertical": False, "count": tables * r * c}
+    seats = []
+    for t in range(tables):
+        data = [f"a{t * r * c + i + 1:03d}" for i in range(r * c)]
+        layout["tables"].append({"r": r, "c": c, "data": data})
+        for i, seat in enumerate(data[::2]):
+            seats.append(
+                {
+                    "seat_name": seat,
+                    "user": {"student_id": f"2{i:03d}", "name": names[i % len(names)]},
+                }
+            )
+    return layout, {"occupied": len(seats), "seats": seats}
+
+
+def legacy_join(str_tables):
+    max_r = max((len(d.split("\n")) for d in str_tables))
+    c = tuple(len(d.split("\n")[0]) for d in str_tables)
+    s = "\n" * max_r
+    for i, t in enumerate(str_tables):
+        sp = t.split("\n")
+        for j in range(max_r):
+            if len(sp) > j:
+                s = s.replace("\n", sp[j] + " " * 3 + "*", 1)
+            else:
+                s = s.replace("\n", " " * (c[i] + 3) + "*", 1)
+        s = s.replace("*", "\n")
+    return s
+
+
+def best(func, n):
+    times = []
+    for _ in range(n):
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="좌석표 렌더링 시간 측정")
+    parser.add_argument("-t", dest="tables", type=int, default=12)
+    parser.add_argument("-r", dest="rows", type=int, default=10)
+    parser.add_argument("-c", dest="cols", type=int, default=8)
+    parser.add_argument("-n", type=int, default=5, help="반복 횟수(최솟값 사용)")
+    args = parser.parse_args()
+
+    layout, reservations = synthetic_area(args.tables, args.rows, args.cols)
+    seatmap = dshs.SeatMap().add_area("a1", layout, reservations)
+    table_data = seatmap.table_data("a1", "", "2000", False)
+    str_tables = [
+        dshs.tabulate.tabulate(t, headers=[], tablefmt="fancy_grid", stralign="center")
+        for t in table_data
+    ]
+
+    print(f"테이블 {args.tables}개, {args.rows}x{args.cols}, 좌석 {layout['count']}개")
+    tab = best(lambda: dshs.render_table(table_data), args.n)
+    legacy = best(lambda: legacy_join(str_tables), args.n)
+    dshs.display_width.cache_clear()
+    cold = best(lambda: dshs.join_horizontal(str_tables), 1)
+    warm = best(lambda: dshs.join_horizontal(str_tables), args.n)
+    print(f"render_table(tabulate 포함)  {tab:8.2f}ms")
+    print(f"예전 replace 방식            {legacy:8.2f}ms")
+    print(f"join_horizontal(캐시 없음)   {cold:8.2f}ms  ({legacy / cold:.1f}배)")
+    print(f"join_horizontal(캐시 있음)   {warm:8.2f}ms  ({legacy / warm:.1f}배)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+bench/mock_server.py를 띄워 놓고 dshs 명령어들을 끝까지 실행해 보는 벤치마크
+명령어마다 첫 실행(빈 캐시) 시간, 이후 실행 시간의 중앙값, 요청 수를 보여주고
+마지막에 큰 구역의 좌석표 렌더링 시간을 잼
+
+사용법: python bench/run.py [-n 반복 횟수] [--latency ms] [--error-rate 비율] [--json 파일] ...
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from statistics import median
+from time import perf_counter
+from urllib.request import urlopen
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+dshs_path = os.path.join(bench_dir, "..", "dshs.py")
+sys.path.insert(0, bench_dir)
+sys.path.insert(0, os.path.join(bench_dir, ".."))
+
+import mock_server  # noqa: E402
+
+commands = [
+    "-h",
+    "meal",
+    "meal 1019..1025",
+    "userinfo",
+    "penalty -s -a",
+    "out -s -a",
+    "reserve a",
+    "reserve a1",
+    "reserve 2301",
+    "reserve -q 2301,2302,2303",
+    "--format ndjson reserve a1",
+]
+
+
+def setup_home():
+    """로그인되어 있고 업데이트 확인을 건너뛰는 HOME"""
+    home = tempfile.mkdtemp(prefix="dshs-bench-")
+    with open(os.path.join(home, ".dshsconfig.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "access-token": "mock-token",
+                "student-id": "2301",
+                "update-checked": datetime.now().strftime("%Y%m%d"),
+            },
+            f,
+        )
+    return home
+
+
+def request_count(address):
+    with urlopen(address + "_stats") as res:
+        return sum(json.load(res).values())
+
+
+def run_once(command, env, address):
+    before = request_count(address)
+    start = perf_counter()
+    res = subprocess.run(
+        [sys.executable, dshs_path] + command.split(),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    wall = (perf_counter() - start) * 1000
+    return wall, request_count(address) - before, res.returncode
+
+
+def measure(command, address, n):
+    home = setup_home()
+    env = dict(os.environ, HOME=home, USERPROFILE=home, DSHS_BASE_ADDRESS=address)
+    try:
+        cold, cold_requests, code = run_once(command, env, address)
+        warm = [run_once(command, env, address) for _ in range(n)]
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+    return {
+        "command": command,
+        "cold_ms": cold,
+        "cold_requests": cold_requests,
+        "warm_ms": median(w for w, _, _ in warm),
+        "warm_requests": median(r for _, r, _ in warm),
+        "failed": sum(1 for _, _, c in [(cold, 0, code)] + warm if c != 0),
+    }
+
+
+def python_start(n):
+    walls = []
+    for _ in range(n):
+        start = perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"])
+        walls.append((perf_counter() - start) * 1000)
+    return min(walls)
+
+
+def render_time(tables, rows, cols, n):
+    """tables개 테이블, rows x cols 좌석인 구역 하나의 좌석표를 만들어 그리는 시간(ms)"""
+    import dshs
+
+    state = mock_server.MockState(tables=tables, rows=rows, cols=cols)
+    layout = state.area_layout("a1")
+    reservations = state.area_reservations("20260101", "a1")
+    times = []
+    for _ in range(n):
+        dshs.display_width.cache_clear()
+        start = perf_counter()
+        seatmap = dshs.SeatMap().add_area("a1", layout, reservations)
+        dshs.render_table(seatmap.table_data("a1", "a101", "2301", False), False)
+        times.append((perf_counter() - start) * 1000)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dshs 종단 간 벤치마크")
+    parser.add_argument("-n", type=int, default=5, help="명령어마다 반복 횟수(중앙값 사용)")
+    parser.add_argument("--json", dest="json", help="결과를 json으로 저장할 파일")
+    mock_server.add_arguments(parser)
+    args = parser.parse_args()
+
+    server, address = mock_server.start(mock_server.state_from(args))
+    baseline = python_start(args.n)
+    results = []
+    print(f"python 시작 시간 {baseline:.1f}ms (아래 시간에 포함됨)")
+    print(f"{'명령어':34} {'첫 실행':>10} {'요청':>5} {'이후 실행':>10} {'요청':>5}")
+    for command in commands:
+        result = measure(command, address, args.n)
+        results.append(result)
+        print(
+            f"dshs {command:29} {result['cold_ms']:8.1f}ms {result['cold_requests']:5}"
+            f" {result['warm_ms']:8.1f}ms {result['warm_requests']:5g}"
+            + (f"  실패 {result['failed']}회" if result["failed"] else "")
+        )
+    server.shutdown()
+
+    print()
+    renders = []
+    for tables, rows, cols in [(4, 2, 4), (10, 4, 8), (20, 6, 10)]:
+        ms = render_time(tables, rows, cols, args.n)
+        renders.append({"tables": tables, "rows": rows, "cols": cols, "render_ms": ms})
+        print(f"좌석표 렌더링 {tables}x{rows}x{cols} ({tables * rows * cols}석): {ms:.2f}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"python_start_ms": baseline, "commands": results, "render": renders},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+    sys.exit(1 if any(r["failed"] for r in results) and not args.error_rate else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+dshs -h, dshs meal의 시작 시간 측정
+python -X importtime 결과로 dshs.py가 불러오는 모듈의 import 시간을 합산하고,
+실행 시간과 함께 예산(ms)을 넘으면 1로 종료함
+
+사용법: python bench/startup.py [-n 반복 횟수]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from time import perf_counter
+
+dshs_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dshs.py")
+
+# 명령어: (import 예산, 실행 시간 예산) ms
+budget = {
+    "-h": (25, 100),
+    "meal": (30, 100),
+}
+
+
+def setup_home():
+    """네트워크 없이 meal이 끝나도록 오늘 급식과 업데이트 확인 날짜를 채워 둔 HOME"""
+    home = tempfile.mkdtemp(prefix="dshs-bench-")
+    today = datetime.now().strftime("%Y%m%d")
+    with open(os.path.join(home, ".dshsconfig.json"), "w", encoding="utf-8") as f:
+        json.dump({"update-checked": today}, f)
+    os.makedirs(os.path.join(home, ".dshs"))
+    with open(os.path.join(home, ".dshs", "meals.json"), "w", encoding="utf-8") as f:
+        json.dump({today: ["아침", "점심", "저녁"]}, f)
+    return home
+
+
+def import_time(stderr):
+    """site 이후(dshs.py가 실행된 뒤) 최상위 import들의 누적 시간 합(ms)"""
+    total = 0
+    after_site = False
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        cumulative, name = line.split("|")[1:3]
+        if name.startswith("  "):
+            continue
+        if after_site:
+            total += int(cumulative)
+        elif name.strip() == "site":
+            after_site = True
+    return total / 1000
+
+
+def measure(command, home, n):
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    imports = []
+    walls = []
+    for _ in range(n):
+        start = perf_counter()
+        res = subprocess.run(
+            [sys.executable, "-X", "importtime", dshs_path, command],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        walls.append((perf_counter() - start) * 1000)
+        imports.append(import_time(res.stderr))
+    baseline = []
+    for _ in range(n):
+        start = perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], env=env)
+        baseline.append((perf_counter() - start) * 1000)
+    return min(imports), min(walls) - min(baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dshs 시작 시간 측정")
+    parser.add_argument("-n", type=int, default=5, help="반복 횟수(최솟값 사용)")
+    args = parser.parse_args()
+    home = setup_home()
+    failed = False
+    for command, (import_budget, wall_budget) in budget.items():
+        imports, wall = measure(command, home, args.n)
+        ok = imports <= import_budget and wall <= wall_budget
+        failed = failed or not ok
+        print(
+            f"dshs {command:5} import {imports:6.1f}ms (예산 {import_budget}ms)"
+            f"  실행 {wall:6.1f}ms (예산 {wall_budget}ms)  {'OK' if ok else '초과'}"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,32 +5,148 @@ dshs.app을 cli에서 접근할 수 있도록 하는 Python 코드
 작동하면 된다는 마인드로 최대한 대충 짬
 버전 0.1.2
 """
-import argparse
 import json
-import webbrowser
+import os
+import sys
+from time import perf_counter
+
+# --trace의 시작 시각(0)
+started = perf_counter()
+
+# 설정 파일(~/.dshsconfig.json)을 뺀 캐시, 기록, 소켓은 모두 이 폴더에 둠
+data_dir = os.path.join(os.path.expanduser("~"), ".dshs")
+daemon_socket_path = os.path.join(data_dir, "sock")
+# daemon에 넘기지 않고 항상 직접 실행하는 명령어(입력을 받거나 daemon 자체를 다루는 명령어)
+local_commands = ["daemon", "auth", "a"]
+
+
+def forward_to_daemon(argv):
+    """
+    실행 중인 daemon이 있으면 명령어를 넘기고 출력을 그대로 받은 뒤 종료함
+    daemon이 없으면 아무 일도 하지 않고 반환하므로 그대로 직접 실행하면 됨
+    """
+    import socket
+
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(daemon_socket_path):
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(daemon_socket_path)
+    except OSError:
+        sock.close()
+        return
+    # 상대 경로는 daemon이 이 작업 폴더를 기준으로 해석함
+    request = {"argv": argv, "cwd": os.getcwd()}
+    if "-" in argv and not sys.stdin.isatty():
+        request["stdin"] = sys.stdin.read()
+    sock.sendall(json.dumps(request).encode() + b"\n")
+    f = sock.makefile("rb")
+    while True:
+        head = f.read(5)
+        if len(head) < 5:
+            sys.stderr.write("daemon과의 연결이 끊어졌습니다.\n")
+            sys.exit(1)
+        kind, size = head[:1], int.from_bytes(head[1:], "big")
+        data = f.read(size)
+        if kind == b"x":
+            sys.exit(int(data))
+        out = sys.stdout if kind == b"o" else sys.stderr
+        out.buffer.write(data)
+        out.flush()
+
+
+# 값을 받는 전역 옵션
+value_options = ["--format", "--trace"]
+
+
+def command_of(argv):
+    """--format 같은 전역 옵션을 건너뛴 명령어 이름"""
+    i = 0
+    while i < len(argv) and argv[i].startswith("-"):
+        i += 2 if argv[i] in value_options else 1
+    return argv[i] if i < len(argv) else None
+
+
+def has_option(argv, short, long):
+    """argv에 -x 또는 --long 옵션이 있는지, -cw처럼 묶어 쓴 짧은 옵션도 확인함"""
+    return long in argv or any(a[:1] == "-" and a[1:2] != "-" and short[1:] in a[1:] for a in argv)
+
+
+def runs_locally(argv):
+    """
+    daemon에 넘기지 않을 명령어면 True
+    reserve --watch, --at은 끝나지 않거나 오래 기다리므로 daemon을 붙잡지 않도록 직접 실행함
+    """
+    command = command_of(argv)
+    # 명령어가 없으면 REPL이므로 직접 실행함
+    if command is None or command in local_commands:
+        return True
+    if command in ["reserve", "r", "rt"]:
+        return "--at" in argv or has_option(argv, "-w", "--watch")
+    return False
+
+
+# 무거운 모듈을 불러오기 전에 daemon부터 확인함
+if __name__ == "__main__" and len(sys.argv) > 1 and not runs_locally(sys.argv[1:]):
+    forward_to_daemon(sys.argv[1:])
+
+import argparse
+import importlib
+import io
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from functools import lru_cache
 from itertools import cycle
-from time import sleep
-from threading import Thread
+from time import sleep, time
+from threading import Thread, Lock, RLock
+import threading
+import random
 import re
+import shutil
+import tempfile
 
-try:
-    import requests
-except ImportError:
-    print("requests가 설치되어 있지 않습니다. 다음 명령어 실행:\npip install requests")
-    exit(1)
+version = "0.1.2"
 
-try:
-    from tabulate import tabulate
-except ImportError:
-    print("tabulate가 설치되어 있지 않습니다. 다음 명령어 실행:\npip install tabulate")
-    exit(1)
 
-import os
-import sys
+class LazyModule:
+    """처음 속성에 접근할 때 import하는 모듈. 명령어에 필요한 모듈만 불러와서 시작 시간을 줄임"""
 
-version = "0.1.2"
+    def __init__(self, name, package=None):
+        self.name = name
+        self.package = package or name
+        self.module = None
+        self._lock = Lock()
+
+    def __getattr__(self, attr):
+        if self.module is None:
+            with self._lock:
+                if self.module is None:
+                    self._load()
+        return getattr(self.module, attr)
+
+    def _load(self):
+        try:
+            # --trace에서 처음 쓸 때 불러오는 시간이 요청이나 그리기 구간에 섞이지 않도록 따로 기록함
+            with tracer.span(f"import {self.name}", "startup"):
+                self.module = importlib.import_module(self.name)
+        except ImportError:
+            print(
+                f"{self.package}가 설치되어 있지 않습니다. 다음 명령어 실행:\npip install {self.package}"
+            )
+            exit(1)
+
+
+requests = LazyModule("requests")
+tabulate = LazyModule("tabulate")
+webbrowser = LazyModule("webbrowser")
+futures = LazyModule("concurrent.futures")
+sqlite3 = LazyModule("sqlite3")
+email_utils = LazyModule("email.utils")
+socketserver = LazyModule("socketserver")
+wcwidth = LazyModule("wcwidth")
+hashlib = LazyModule("hashlib")
+imports_done = perf_counter()
 
 grey = "\x1b[38;21m"
 yellow = "\x1b[33m"
@@ -77,89 +193,645 @@ logger.addHandler(ch)
 is_interactive = os.isatty(sys.stdout.fileno())
 
 
-class Loader:
-    # https://stackoverflow.com/questions/22029562/python-how-to-make-simple-animated-loading-while-process-is-running
-    # TODO: 인터렉티브 아니면 로딩 표시하지 않기
-    def __init__(self, desc="Loading...", end="", timeout=0.1):
-        """
-        A loader-like context manager
-
-        Args:
-            desc (str, optional): The loader's description. Defaults to "Loading...".
-            end (str, optional): Final print. Defaults to "Done!".
-            timeout (float, optional): Sleep time between prints. Defaults to 0.1.
-        """
-        self.desc = desc
-        self.end = end
-        self.timeout = timeout
+# batch에서는 여러 스레드가 동시에 plain_output을 쓰므로 처음 들어갈 때 저장하고 마지막으로 나갈 때 되돌림
+plain_state = {"depth": 0, "previous": None}
+plain_lock = Lock()
 
-        self._thread = Thread(target=self._animate, daemon=True)
-        self.steps = ["／", "－", "＼", "｜"]
-        self.done = False
 
-    def start(self):
-        self._thread.start()
-        return self
+@contextmanager
+def plain_output():
+    """--format 출력 중에는 진행 표시와 로그 색을 끔"""
+    global is_interactive
+    with plain_lock:
+        if plain_state["depth"] == 0:
+            plain_state["previous"] = is_interactive, ch.formatter
+            is_interactive = False
+            ch.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        plain_state["depth"] += 1
+    try:
+        yield
+    finally:
+        with plain_lock:
+            plain_state["depth"] -= 1
+            if plain_state["depth"] == 0:
+                is_interactive, formatter = plain_state["previous"]
+                ch.setFormatter(formatter)
+
+
+class RecordWriter:
+    """
+    --format으로 고른 형식으로 기록(dict)을 하나씩 바로 출력함
+    json은 배열 하나, ndjson은 한 줄에 하나, tsv는 첫 기록의 키를 머리글로 씀
+    """
+
+    def __init__(self, fmt, stream=None):
+        self.fmt = fmt
+        self.stream = stream or sys.stdout
+        self.count = 0
+        self.fields = None
+
+    def write(self, record):
+        if self.fmt == "tsv":
+            if self.fields is None:
+                self.fields = list(record)
+                self.stream.write("\t".join(self.fields) + "\n")
+            line = "\t".join(self._cell(record.get(k)) for k in self.fields) + "\n"
+        else:
+            line = json.dumps(record, ensure_ascii=False)
+            if self.fmt == "json":
+                line = ("[\n" if not self.count else ",\n") + line
+            else:
+                line += "\n"
+        self.count += 1
+        self.stream.write(line)
+        self.stream.flush()
+
+    def close(self):
+        if self.fmt == "json":
+            self.stream.write("\n]\n" if self.count else "[]\n")
+            self.stream.flush()
+
+    @staticmethod
+    def _cell(value):
+        if value is None:
+            return ""
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, ensure_ascii=False)
+        return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+class Progress:
+    """
+    프로세스 전체에서 하나만 쓰는 진행 표시
+    진행 중인 요청을 모아서 한 줄로 보여주고(예: "요청 3개 120ms"), timeout초마다 한 번만 다시 그림
+    timeout초 안에 끝나는 요청은 아무것도 그리지 않고, is_interactive가 아니면 아무 일도 하지 않음
+    """
+
+    steps = ["／", "－", "＼", "｜"]
+
+    def __init__(self, timeout=0.1):
+        self.timeout = timeout
+        self.tasks = {}
+        self.lock = Lock()
+        self.thread = None
+        self.drawn = 0
+        self.next_id = 0
+
+    @contextmanager
+    def task(self, desc):
+        if not is_interactive:
+            yield
+            return
+        with self.lock:
+            key = self.next_id
+            self.next_id += 1
+            self.tasks[key] = (desc, perf_counter())
+            if self.thread is None:
+                self.thread = Thread(target=self._animate, daemon=True)
+                self.thread.start()
+        try:
+            yield
+        finally:
+            with self.lock:
+                del self.tasks[key]
+                if not self.tasks:
+                    self._clear()
 
     def _animate(self):
         for c in cycle(self.steps):
-            if self.done:
-                break
-            print(f"\r{self.desc} {c}", flush=True, end="")
             sleep(self.timeout)
+            with self.lock:
+                if not self.tasks:
+                    self.thread = None
+                    return
+                self._draw(c)
+
+    def _draw(self, c):
+        desc, start = min(self.tasks.values(), key=lambda t: t[1])
+        elapsed = (perf_counter() - start) * 1000
+        if len(self.tasks) > 1:
+            desc = f"{bold}요청 {len(self.tasks)}개{reset}"
+        line = f"{desc} {grey}{elapsed:.0f}ms{reset} {c}"
+        width = display_width(line)
+        if width >= shutil.get_terminal_size().columns:
+            line = f"{c}"
+            width = display_width(line)
+        sys.stdout.write("\r" + line + " " * max(self.drawn - width, 0))
+        sys.stdout.flush()
+        self.drawn = max(width, self.drawn)
+
+    def _clear(self):
+        if self.drawn:
+            sys.stdout.write("\r" + " " * self.drawn + "\r")
+            sys.stdout.flush()
+            self.drawn = 0
+
+
+progress = Progress()
+
+
+class Tracer:
+    """
+    --trace, --timings에서 쓰는 구간 기록
+    요청(DNS, 연결, TLS, 첫 바이트까지, 본문), JSON 해석, 표 그리기, 시작 시간을 Chrome trace event 형식으로 모음
+    꺼져 있으면 span은 아무 일도 하지 않음
+    """
 
-    def __enter__(self):
-        self.start()
-
-    def stop(self):
-        self.done = True
-        cols = os.get_terminal_size().columns
-        print("\r" + " " * cols, end="", flush=True)
-        print(f"\r{self.end}", flush=True, end="\n" if len(self.end) else "")
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.instrumented = False
+        self.startup_reported = False
+
+    def begin(self):
+        self.enabled = True
+        self.events = []
+        self.instrument()
+        if not self.startup_reported:
+            self.startup_reported = True
+            self.add("imports", "startup", started, imports_done)
+            self.add("startup", "startup", started, perf_counter())
+
+    def add(self, name, cat, start, end, **args):
+        self.events.append(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": round((start - started) * 1e6),
+                "dur": round((end - start) * 1e6),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
 
-    def __exit__(self, exc_type, exc_value, tb):
-        # handle exceptions with those variables ^
-        self.stop()
+    @contextmanager
+    def span(self, name, cat, **args):
+        if not self.enabled:
+            yield args
+            return
+        start = perf_counter()
+        try:
+            yield args
+        finally:
+            self.add(name, cat, start, perf_counter(), **args)
+
+    def request(self, session, method, url, **kwargs):
+        """session.request와 같지만 첫 바이트까지(TTFB)와 본문 받는 시간을 따로 기록함"""
+        name = f"{method} {url.replace(api_address, '')}"
+        marks = {}
+
+        def on_response(response, *args, **kw):
+            marks["ttfb"] = perf_counter()
+
+        with self.span(name, "http", method=method, url=url) as args:
+            start = perf_counter()
+            try:
+                result = session.request(method, url, hooks={"response": on_response}, **kwargs)
+            except Exception as e:
+                args["error"] = type(e).__name__
+                raise
+            end = perf_counter()
+            ttfb = marks.get("ttfb", end)
+            self.add("ttfb", "http", start, ttfb, url=url)
+            self.add("body", "http", ttfb, end, url=url)
+            args["status"] = result.status_code
+            args["bytes"] = len(result.content) if not kwargs.get("stream") else int(result.headers.get("Content-Length") or 0)
+        return result
+
+    def instrument(self):
+        """urllib3 연결에 DNS, TCP 연결, TLS 구간 기록을 붙임(처음 켤 때 한 번)"""
+        if self.instrumented:
+            return
+        self.instrumented = True
+        import socket
+
+        with self.span("import urllib3", "startup"):
+            import urllib3.connection as connection
+
+        tracer = self
+        getaddrinfo = socket.getaddrinfo
+        new_conn = connection.HTTPConnection._new_conn
+        https_connect = connection.HTTPSConnection.connect
+
+        def traced_getaddrinfo(host, *args, **kwargs):
+            with tracer.span("dns", "http", host=host):
+                return getaddrinfo(host, *args, **kwargs)
+
+        def traced_new_conn(conn):
+            with tracer.span("connect", "http", host=conn.host):
+                sock = new_conn(conn)
+            conn._traced_connected = perf_counter()
+            return sock
+
+        def traced_https_connect(conn):
+            https_connect(conn)
+            if tracer.enabled and getattr(conn, "_traced_connected", None):
+                tracer.add("tls", "http", conn._traced_connected, perf_counter(), host=conn.host)
+
+        socket.getaddrinfo = traced_getaddrinfo
+        connection.HTTPConnection._new_conn = traced_new_conn
+        connection.HTTPSConnection.connect = traced_https_connect
+
+    def finish(self, path=None, timings=False):
+        self.enabled = False
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        if timings:
+            self.summary(sys.stderr)
+
+    def summary(self, stream):
+        """구간 이름별 횟수, 합계, 최댓값(ms)"""
+        totals = {}
+        for e in self.events:
+            key = (e["cat"], e["name"])
+            count, total, longest = totals.get(key, (0, 0, 0))
+            totals[key] = (count + 1, total + e["dur"] / 1000, max(longest, e["dur"] / 1000))
+        stream.write(f"{'구간':40} {'횟수':>2} {'합계':>8} {'최대':>8}\n")
+        for (cat, name), (count, total, longest) in sorted(totals.items(), key=lambda t: -t[1][1]):
+            stream.write(f"{cat + ' ' + name:42} {count:4} {total:8.1f}ms {longest:8.1f}ms\n")
+        stream.flush()
+
+
+tracer = Tracer()
 
 
 config_path = os.path.join(os.path.expanduser("~"), ".dshsconfig.json")
+layout_cache_path = os.path.join(data_dir, "layouts.json")
+meal_store_path = os.path.join(data_dir, "meals.json")
+search_cache_path = os.path.join(data_dir, "search.json")
+response_cache_path = os.path.join(data_dir, "responses.json")
+db_path = os.path.join(data_dir, "dshs.db")
+image_dir = os.path.join(data_dir, "images")
+# 모든 저장 파일이 같이 쓰는 잠금 파일
+lock_path = os.path.join(data_dir, "lock")
+
+
+@contextmanager
+def file_lock(path):
+    """다른 dshs 프로세스와 공유하는 advisory 파일 잠금"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a+") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
 
 
 class Config:
-    def __init__(self):
-        if not os.path.exists(config_path):
-            with open(config_path, "w+", encoding="utf-8") as f:
-                f.write("{}")
-        with open(config_path, "r", encoding="utf-8") as f:
-            self.config = json.load(f)
+    # 파일은 처음 값을 읽거나 쓸 때 불러오고, 없으면 save할 때 만듦
+    # 바뀐 값이 있을 때만 저장하며, 저장할 때는 파일을 잠그고 다른 프로세스가 쓴 값 위에 바뀐 값만 덮어쓴 뒤
+    # 임시 파일을 rename해서 한 번에 교체함
+    def __init__(self, path=config_path):
+        self.path = path
+        self.lock = RLock()
+        self._config = None
+        self._stamp = None
+        self.changed = set()
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                st = os.fstat(f.fileno())
+                return json.load(f), (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return {}, None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    @property
+    def config(self):
+        if self._config is None:
+            with self.lock:
+                if self._config is None:
+                    self._config, self._stamp = self._read()
+        return self._config
 
     def get(self, field):
         if field not in self.config:
             return None
         return self.config[field]
 
+    def has(self, field):
+        return field in self.config
+
+    def delete(self, field):
+        with self.lock:
+            if field in self.config:
+                del self.config[field]
+                self.changed.add(field)
+
     def set(self, field, value):
-        self.config[field] = value
+        with self.lock:
+            current = self.config.get(field, self)
+            # 같은 객체를 다시 넣는 경우는 내용이 바뀌었을 수 있으므로 저장 대상으로 봄
+            if current is value or current != value:
+                self.config[field] = value
+                self.changed.add(field)
+
+    def reload(self):
+        """다른 프로세스가 파일을 바꿨으면 다시 읽음. 아직 저장하지 않은 값은 유지됨"""
+        if self._config is None or self._stat() == self._stamp:
+            return False
+        with self.lock:
+            data, self._stamp = self._read()
+            self._apply(data)
+            self._config = data
+        return True
+
+    def _apply(self, data):
+        for field in self.changed:
+            if field in self._config:
+                data[field] = self._config[field]
+            else:
+                data.pop(field, None)
 
     def save(self):
-        with open(config_path, "w+", encoding="utf-8") as f:
-            json.dump(self.config, f)
+        if not self.changed:
+            return
+        with self.lock, file_lock(lock_path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            data, _ = self._read()
+            self._apply(data)
+            fd, tmp = tempfile.mkstemp(
+                prefix=os.path.basename(self.path) + ".", dir=os.path.dirname(self.path)
+            )
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            self._config = data
+            self._stamp = self._stat()
+            self.changed.clear()
 
 
 config = Config()
+# 자습실/구역 배치는 거의 바뀌지 않으므로 {경로: {data, etag, last-modified, time}} 형태로 저장
+layout_cache = Config(layout_cache_path)
+# {yyyymmdd: [아침, 점심, 저녁]}, 급식이 없는 날은 null
+meal_store = Config(meal_store_path)
+# {yyyymmdd: {검색어: 404 또는 422}}, 없는 학생이나 동명이인은 그날 안에 바뀌지 않으므로 다시 묻지 않음
+search_cache = Config(search_cache_path)
+# Requester.get의 마지막 정상 응답 {경로?인자: {data, time}}
+response_cache = Config(response_cache_path)
+# {이미지 이름: {hash, etag, last-modified, time, variants: {폭(px): 파일}}}, 파일은 image_dir에 내용의 sha256으로 저장
+image_cache = Config(os.path.join(image_dir, "index.json"))
+
+
+class Database:
+    """
+    벌점 내역 등 기록을 모아 두는 로컬 SQLite 저장소
+    처음 사용할 때 연결하고 테이블을 만들며, daemon의 여러 스레드에서 같이 쓰도록 잠금으로 보호함
+    """
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    CREATE TABLE IF NOT EXISTS penalties (
+        key TEXT PRIMARY KEY, day TEXT, date TEXT, points INTEGER, reason TEXT, giver TEXT
+    );
+    CREATE INDEX IF NOT EXISTS penalties_day ON penalties (day);
+    CREATE TABLE IF NOT EXISTS outrequests (
+        key TEXT PRIMARY KEY, day TEXT, start TEXT, end TEXT, category TEXT, reason TEXT, status TEXT
+    );
+    CREATE INDEX IF NOT EXISTS outrequests_day ON outrequests (day);
+    CREATE INDEX IF NOT EXISTS outrequests_category ON outrequests (category, day);
+    CREATE TABLE IF NOT EXISTS occupancy (
+        day TEXT, area TEXT, occupied INTEGER, count INTEGER, time REAL, PRIMARY KEY (day, area)
+    );
+    """
+
+    def __init__(self, path=db_path):
+        self.path = path
+        self.lock = RLock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            with self.lock:
+                if self._conn is None:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    conn = sqlite3.connect(self.path, check_same_thread=False)
+                    conn.row_factory = sqlite3.Row
+                    conn.executescript(self.schema)
+                    self._conn = conn
+        return self._conn
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self):
+        with self.lock, self.conn:
+            yield self.conn
+
+    def get_meta(self, key):
+        rows = self.query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0]["value"] if rows else None
+
+    def set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def sync_start(self, table):
+        """마지막 동기화 날짜에서 sync-overlap일(기본값 7) 전, 동기화한 적이 없으면 None(전체)"""
+        last = self.get_meta(f"{table}-synced")
+        if not last:
+            return None
+        overlap = int(config.get("sync-overlap") or 7)
+        return (datetime.strptime(last, "%Y%m%d") - timedelta(days=overlap)).strftime("%Y%m%d")
+
+    def replace(self, table, since, records, **meta):
+        """
+        since 이후의 기록을 records로 교체함
+        겹치는 구간은 받은 내용으로 교체하므로 중복이 생기지 않고 서버에서 지워진 기록도 지워짐
+        """
+        with self.transaction() as conn:
+            # from은 UTC 날짜 기준일 수 있으므로 한국 시간으로 since 다음 날부터만 확실히 다시 받은 구간으로 봄
+            conn.execute(f"DELETE FROM {table} WHERE day > ?", (since or "",))
+            if records:
+                marks = ", ".join("?" * len(records[0]))
+                conn.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({marks})", records)
+            self.set_meta(conn, f"{table}-synced", datetime.now().strftime("%Y%m%d"))
+            for key, value in meta.items():
+                self.set_meta(conn, f"{table}-{key}", value)
 
 
-base_address = "https://www.dshs.app/"
+db = Database()
+
+
+# bench/mock_server.py 같은 다른 서버에 연결할 때 DSHS_BASE_ADDRESS로 바꿀 수 있음
+base_address = os.environ.get("DSHS_BASE_ADDRESS", "https://www.dshs.app/").rstrip("/") + "/"
 api_address = base_address + "api/v1/"
 auth_address = base_address + "authorize"
-client_id = config.get("client_id") or "sss"
-client_secret = config.get("client_secret") or "ddd"
+
+
+def client_id():
+    return config.get("client_id") or "sss"
+
+
+def client_secret():
+    return config.get("client_secret") or "ddd"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class OfflineError(Exception):
+    pass
+
+
+# 경로별 (새 응답으로 보는 시간, 바로 돌려주고 뒤에서 새로 받는 최대 시간) 초, "day"는 받은 날 자정까지
+# 이 시간이 지났어도 서버에 연결하지 못하면 저장된 응답을 사용함
+response_policies = [
+    (re.compile(r"^reservations/\d{8}/(areas|rooms)/"), 5, 60),
+    (re.compile(r"^reservations/\d{8}/search"), 5, 60),
+    (re.compile(r"^userinfo"), 24 * 60 * 60, float("inf")),
+]
+
+
+def response_policy(path):
+    for pattern, fresh, stale in response_policies:
+        if pattern.match(path):
+            return fresh, stale
+    return 0, 0
+
+
+def is_fresh(fresh, saved):
+    if fresh == "day":
+        return datetime.fromtimestamp(saved).date() == datetime.now().date()
+    return time() - saved < fresh
+
+
+def save_responses():
+    """
+    명령어가 끝날 때 response_cache를 한 번에 저장함
+    stale 기간이 지나 더 쓰지 않을 응답과 memo-ttl이 지난 memo는 이때 지움
+    """
+    Requester.prune()
+    if not response_cache.changed:
+        return
+    now = time()
+    with response_cache.lock:
+        for key, entry in list(response_cache.config.items()):
+            if now - entry["time"] > response_policy(key)[1]:
+                response_cache.delete(key)
+    response_cache.save()
+
+
+def format_age(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f}초"
+    if seconds < 60 * 60:
+        return f"{seconds / 60:.0f}분"
+    if seconds < 24 * 60 * 60:
+        return f"{seconds / 60 / 60:.0f}시간"
+    return f"{seconds / 24 / 60 / 60:.0f}일"
+
+
+class RateLimiter:
+    """여러 스레드가 같이 쓰는 초당 rate회 제한, wait는 다음 차례까지 기다림"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next = 0
+        self.lock = Lock()
+
+    def wait(self):
+        with self.lock:
+            now = perf_counter()
+            start = max(now, self.next)
+            self.next = start + self.interval
+        if start > now:
+            sleep(start - now)
+
+
+class CircuitBreaker:
+    """
+    호스트별 회로 차단기
+    연속으로 breaker-threshold번 실패하면 breaker-cooldown초 동안 요청하지 않고 바로 실패함
+    대기 시간이 지나면 시험 요청 하나만 보내고(half-open), 그 결과가 나올 때까지 다른 요청은 계속 바로 실패함
+    상태는 프로세스에 남아 있으므로 REPL에서는 명령어가 바뀌어도 유지됨
+    """
+
+    breakers = {}
+    breakers_lock = Lock()
+
+    def __init__(self, host):
+        self.host = host
+        self.failures = 0
+        self.opened_at = None
+        # 시험 요청을 보낸 시각, 결과가 기록되지 않고 대기 시간이 다시 지나면 새 시험 요청을 보냄
+        self.probe_at = None
+        self.lock = Lock()
+
+    @classmethod
+    def for_url(cls, url):
+        host = url.split("/")[2]
+        with cls.breakers_lock:
+            if host not in cls.breakers:
+                cls.breakers[host] = cls(host)
+            return cls.breakers[host]
+
+    def check(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            cooldown = float(config.get("breaker-cooldown") or 30)
+            left = cooldown - (time() - self.opened_at)
+            if left > 0:
+                raise CircuitOpenError(
+                    f"{self.host}: 연속으로 요청에 실패해서 {left:.0f}초 동안 요청하지 않습니다."
+                )
+            if self.probe_at is not None and time() - self.probe_at < cooldown:
+                raise CircuitOpenError(f"{self.host}: 시험 요청의 결과를 기다리는 중입니다.")
+            # 이 요청이 시험 요청이 됨, 실패하면 record에서 바로 다시 열림
+            self.probe_at = time()
+
+    def record(self, success):
+        with self.lock:
+            self.probe_at = None
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= int(config.get("breaker-threshold") or 5):
+                self.opened_at = time()
+
+    def is_open(self):
+        return self.opened_at is not None
 
 
 def use_loader(func):
     def wrapper(*args, **kwargs):
         if is_interactive:
-            with Loader(bold + func.__name__.upper() + " " + args[1] + reset):
+            with progress.task(bold + func.__name__.upper() + " " + args[1] + reset):
                 return func(*args, **kwargs)
         else:
             return func(*args, **kwargs)
@@ -167,34 +839,289 @@ def use_loader(func):
     return wrapper
 
 
+class InflightCall:
+    """진행 중인 GET 하나, 같은 요청을 기다리는 스레드들이 결과나 예외를 같이 받음"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
 class Requester:
+    # 모든 요청이 같은 keep-alive 세션을 사용해서 연결을 재사용함
+    _session = None
+    # --offline이면 send가 네트워크에 접근하지 않고 OfflineError를 발생시킴
+    offline = False
+    # 뒤에서 새로 받는 중인 요청 {캐시 키: Thread}
+    refreshing = {}
+    _refresh_lock = Lock()
+    # 프로세스 안에서 memo-ttl초 동안 다시 쓰는 응답 {캐시 키: (시각, 응답)}
+    memo = {}
+    # 같은 GET을 동시에 보내면 먼저 보낸 요청 하나의 결과를 같이 씀 {캐시 키: InflightCall}
+    inflight = {}
+    _lock = Lock()
+
     def __init__(self, token):
         self.token = token
         self.header = {"Authorization": f"Bearer {token}"}
+        self.session = Requester.get_session()
+
+    @staticmethod
+    def get_session():
+        if Requester._session is None:
+            pool_size = int(config.get("pool-size") or 4)
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            Requester._session = session
+        return Requester._session
+
+    @staticmethod
+    def stats():
+        """호스트별 요청 수와 새로 연 연결 수, 재사용된 연결 수"""
+        result = {}
+        if Requester._session is None:
+            return result
+        for prefix, adapter in Requester._session.adapters.items():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                if pool is None or pool.host in result:
+                    continue
+                result[pool.host] = {
+                    "requests": pool.num_requests,
+                    "connections": pool.num_connections,
+                    "reused": pool.num_requests - pool.num_connections,
+                }
+        return result
+
+    @staticmethod
+    def send(method, url, **kwargs):
+        """
+        타임아웃, 재시도, 회로 차단기를 적용해서 요청을 보냄
+        GET만 5xx나 연결 오류에서 지수 백오프(jitter 포함)로 재시도함
+
+        Returns:
+            requests.Response: raise_for_status는 호출하지 않음
+        """
+        if Requester.offline:
+            raise OfflineError("오프라인 모드에서 저장되지 않은 응답이 필요합니다.")
+        breaker = CircuitBreaker.for_url(url)
+        breaker.check()
+        timeout = (
+            float(config.get("connect-timeout") or 3.05),
+            float(config.get("read-timeout") or 10),
+        )
+        attempts = 1 + (int(config.get("retries") or 2) if method == "GET" else 0)
+        backoff = float(config.get("retry-backoff") or 0.3)
+        session = Requester.get_session()
+        for attempt in range(attempts):
+            try:
+                if tracer.enabled:
+                    result = tracer.request(session, method, url, timeout=timeout, **kwargs)
+                else:
+                    result = session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                breaker.record(False)
+                if attempt + 1 == attempts or breaker.is_open():
+                    raise e
+            else:
+                breaker.record(result.status_code < 500)
+                if method in ["POST", "PUT", "DELETE"] and result.status_code < 400:
+                    Requester.invalidate(url)
+                if result.status_code < 500 or attempt + 1 == attempts or breaker.is_open():
+                    return result
+            sleep(backoff * 2**attempt * random.uniform(0.5, 1.5))
+
+    @staticmethod
+    def invalidate(url):
+        """url에 쓰기 요청이 성공하면 그 아래 경로의 저장된 응답을 지움(예: reservations/날짜 -> reservations/날짜/areas/a1)"""
+        path = url.replace(api_address, "")
+        with Requester._lock:
+            for key in [k for k in Requester.memo if k.startswith(path)]:
+                del Requester.memo[key]
+        with response_cache.lock:
+            for key in [k for k in response_cache.config if k.startswith(path)]:
+                response_cache.delete(key)
+
+    @staticmethod
+    def prune():
+        """memo-ttl이 지난 응답과 끝난 새로 받기 스레드를 지움(daemon에서 계속 쌓이지 않도록)"""
+        ttl = float(config.get("memo-ttl") or 3)
+        now = time()
+        with Requester._lock:
+            for key in [k for k, (t, _) in Requester.memo.items() if now - t >= ttl]:
+                del Requester.memo[key]
+        with Requester._refresh_lock:
+            for key in [k for k, thread in Requester.refreshing.items() if not thread.is_alive()]:
+                del Requester.refreshing[key]
+
+    @staticmethod
+    def clear_cache():
+        """다른 사용자로 로그인하면 이전 사용자의 응답을 쓰지 않도록 모두 지움"""
+        Requester.invalidate(api_address)
+
+    @staticmethod
+    def parse(result):
+        with tracer.span("json", "parse", url=result.url):
+            return result.json()
 
     @use_loader
-    def get(self, path: str, params=None):
-        result = requests.get(api_address + path, params=params, headers=self.header)
-        result.raise_for_status()
-        return result.json()
+    def get(self, path: str, params=None, cached=True):
+        """
+        response_policies에 따라 저장된 응답을 사용함
+        새 응답이면 그대로, 조금 지났으면 바로 돌려주고 뒤에서 새로 받고, 서버에 연결하지 못하면 오래된 응답이라도 돌려줌
+
+        Args:
+            cached (bool, optional): False면 항상 서버에서 받음(받은 응답은 저장함). Defaults to True.
+        """
+        key = path + ("?" + "&".join(f"{k}={v}" for k, v in sorted(params.items())) if params else "")
+        if not cached:
+            return self._get(key, path, params)
+        memo = Requester.memo.get(key)
+        if memo and time() - memo[0] < float(config.get("memo-ttl") or 3):
+            return memo[1]
+        fresh, stale = response_policy(path)
+        entry = response_cache.get(key)
+        if entry:
+            age = time() - entry["time"]
+            if is_fresh(fresh, entry["time"]):
+                return entry["data"]
+            if Requester.offline or age < stale:
+                logger.warning(f"{format_age(age)} 전에 받은 응답입니다: {path}")
+                if not Requester.offline:
+                    self.refresh_later(key, path, params)
+                return entry["data"]
+        try:
+            return self._get(key, path, params)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, CircuitOpenError) as e:
+            if not entry:
+                raise e
+        except requests.exceptions.HTTPError as e:
+            if not entry or e.response is None or e.response.status_code < 500:
+                raise e
+        logger.warning(f"서버에 연결하지 못해 {format_age(time() - entry['time'])} 전에 받은 응답을 사용합니다: {path}")
+        return entry["data"]
+
+    def _get(self, key, path, params=None):
+        with Requester._lock:
+            call = Requester.inflight.get(key)
+            owner = call is None
+            if owner:
+                call = Requester.inflight[key] = InflightCall()
+        if not owner:
+            return call.wait()
+        try:
+            result = self.send("GET", api_address + path, params=params, headers=self.header)
+            result.raise_for_status()
+            data = self.parse(result)
+            now = time()
+            with Requester._lock:
+                Requester.memo[key] = (now, data)
+            # stale 기간이 없는 경로는 다시 쓰지 않으므로 저장하지 않음
+            if response_policy(path)[1] > 0:
+                response_cache.set(key, {"data": data, "time": now})
+            call.result = data
+            return data
+        except BaseException as e:
+            call.error = e
+            raise e
+        finally:
+            with Requester._lock:
+                Requester.inflight.pop(key, None)
+            call.done.set()
+
+    def refresh_later(self, key, path, params):
+        def refresh():
+            try:
+                self._get(key, path, params)
+            except Exception:
+                pass
+
+        with Requester._refresh_lock:
+            if key in Requester.refreshing and Requester.refreshing[key].is_alive():
+                return
+            thread = Thread(target=refresh, daemon=True)
+            Requester.refreshing[key] = thread
+        thread.start()
+
+    @staticmethod
+    def wait_refreshes():
+        """뒤에서 새로 받는 요청이 끝날 때까지 기다림(프로세스가 끝나기 전에 저장되도록)"""
+        timeout = float(config.get("read-timeout") or 10)
+        for thread in list(Requester.refreshing.values()):
+            thread.join(timeout)
+        Requester.refreshing.clear()
+
+    def get_cached(self, path: str, cache: Config, ttl: float, refresh=False):
+        """
+        cache에 저장된 응답을 ttl(초) 동안 그대로 사용하고, 그 뒤에는 ETag/Last-Modified로 재검증함
+        오프라인이거나 서버에 연결하지 못하면 기간이 지난 응답이라도 사용함
+
+        Args:
+            refresh (bool, optional): 캐시를 무시하고 새로 받음. Defaults to False.
+        """
+        entry = cache.get(path)
+        if entry and not refresh and (Requester.offline or time() - entry["time"] < ttl):
+            return entry["data"]
+        try:
+            return self.fetch(path, cache, None if refresh else entry)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, CircuitOpenError, OfflineError) as e:
+            if not entry:
+                raise e
+            logger.warning(f"서버에 연결하지 못해 저장된 배치를 사용합니다: {path}")
+            return entry["data"]
+
+    @use_loader
+    def fetch(self, path: str, cache: Config, entry=None):
+        header = dict(self.header)
+        if entry:
+            if entry.get("etag"):
+                header["If-None-Match"] = entry["etag"]
+            if entry.get("last-modified"):
+                header["If-Modified-Since"] = entry["last-modified"]
+        result = self.send("GET", api_address + path, headers=header)
+        if result.status_code == 304 and entry:
+            entry["time"] = time()
+        else:
+            result.raise_for_status()
+            entry = {
+                "data": self.parse(result),
+                "etag": result.headers.get("ETag"),
+                "last-modified": result.headers.get("Last-Modified"),
+                "time": time(),
+            }
+        cache.set(path, entry)
+        cache.save()
+        return entry["data"]
 
     @use_loader
     def post(self, path: str, params: dict):
-        result = requests.post(api_address + path, data=params, headers=self.header)
+        result = self.send("POST", api_address + path, data=params, headers=self.header)
         result.raise_for_status()
-        return result.json()
+        return self.parse(result)
 
     @use_loader
     def put(self, path: str, params: dict):
-        result = requests.put(api_address + path, data=params, headers=self.header)
+        result = self.send("PUT", api_address + path, data=params, headers=self.header)
         result.raise_for_status()
-        return result.json()
+        return self.parse(result)
 
     @use_loader
     def delete(self, path: str, params: dict):
-        result = requests.delete(api_address + path, data=params, headers=self.header)
+        result = self.send("DELETE", api_address + path, data=params, headers=self.header)
         result.raise_for_status()
-        return result.json()
+        return self.parse(result)
 
 
 def error_handler(func):
@@ -215,37 +1142,90 @@ def error_handler(func):
         except requests.exceptions.ConnectionError as e:
             logger.error("오류: 서버와 연결하지 못했습니다.")
             raise e
+        except requests.exceptions.Timeout as e:
+            logger.error("서버 응답 시간이 초과되었습니다.")
+            raise e
+        except (CircuitOpenError, OfflineError) as e:
+            logger.error(str(e))
+            raise e
 
     return wrapper
 
 
 class Auth:
-    def __init__(self):
-        self.access_token = config.get("access-token") or ""
+    # 다른 프로세스가 새로 로그인하면 config.reload 뒤에 바로 새 토큰을 사용함
+    @property
+    def access_token(self):
+        return config.get("access-token") or ""
+
+    @access_token.setter
+    def access_token(self, value):
+        if value != config.get("access-token"):
+            Requester.clear_cache()
+        config.set("access-token", value)
 
     def get_access_token(self, code):
-        res = requests.post(
+        res = Requester.send(
+            "POST",
             api_address + "token",
-            {
-                "client_id": client_id,
-                "client_secret": client_secret,
+            data={
+                "client_id": client_id(),
+                "client_secret": client_secret(),
                 "code": code,
                 "grant_type": "authorization_code",
             },
         )
         res.raise_for_status()
         self.access_token = res.json()["access_token"]
-        config.set("access-token", self.access_token)
         config.set(
             "student-id", Requester(self.access_token).get("userinfo")["student_id"]
         )
         config.save()
+        # auth는 exit(0)으로 끝나므로 이전 사용자의 응답을 지운 것을 여기서 저장함
+        save_responses()
 
 
 class Client:
     def __init__(self):
         self.auth = Auth()
-        self.requester = Requester(self.auth.access_token)
+        self._requester = None
+
+    @property
+    def requester(self):
+        token = self.auth.access_token
+        if self._requester is None or self._requester.token != token:
+            # daemon이나 REPL에서 config.reload로 다른 사용자의 토큰을 읽었으면 이전 응답을 쓰지 않음
+            if self._requester is not None:
+                Requester.clear_cache()
+            self._requester = Requester(token)
+        return self._requester
+
+    def gather(self, *calls):
+        """
+        서로 의존하지 않는 요청들을 동시에 실행함
+
+        Args:
+            calls: (메서드, 인자...) 튜플. 각 메서드의 error_handler는 그대로 적용됨
+
+        Returns:
+            list: calls 순서대로의 결과. 하나라도 실패하면 모두 끝난 뒤 첫 번째 예외를 다시 발생시킴
+        """
+        if len(calls) == 1:
+            return [calls[0][0](*calls[0][1:])]
+        workers = min(len(calls), int(config.get("pool-size") or 4))
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            tasks = [executor.submit(call[0], *call[1:]) for call in calls]
+        results = []
+        error = None
+        for future in tasks:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(None)
+                error = error or e
+        if error:
+            raise error
+        return results
 
     @error_handler
     def meal(self, date: str):
@@ -258,9 +1238,108 @@ class Client:
             else:
                 raise e
 
+    def layout_ttl(self):
+        # layout-ttl: 배치 캐시 유효 기간(일)
+        return float(config.get("layout-ttl") or 7) * 24 * 60 * 60
+
+    def room_image(self, room):
+        """
+        자습실 이미지를 터미널 폭에 맞게 줄인 PNG로 돌려줌
+        원본은 내용의 해시로 저장하고 layout-ttl이 지나면 ETag/Last-Modified로 재검증함
+        줄인 이미지는 폭마다 저장해 두므로 PIL은 처음 한 번만 불러옴
+
+        Returns:
+            bytes: PNG
+        """
+        name = f"{room}_labeled.png"
+        entry = image_cache.get(name)
+        if not entry or time() - entry["time"] >= self.layout_ttl() or not os.path.exists(
+            os.path.join(image_dir, entry["hash"] + ".png")
+        ):
+            entry = self.fetch_image(name, entry)
+        width = terminal_pixel_width()
+        variant = entry["variants"].get(str(width))
+        path = os.path.join(image_dir, variant or "")
+        if not variant or not os.path.exists(path):
+            variant = f"{entry['hash']}-{width}.png"
+            path = os.path.join(image_dir, variant)
+            scale_image(os.path.join(image_dir, entry["hash"] + ".png"), path, width)
+            entry["variants"][str(width)] = variant
+            image_cache.set(name, entry)
+            image_cache.save()
+        with open(path, "rb") as f:
+            return f.read()
+
+    def fetch_image(self, name, entry=None):
+        headers = {}
+        if entry and os.path.exists(os.path.join(image_dir, entry["hash"] + ".png")):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last-modified"):
+                headers["If-Modified-Since"] = entry["last-modified"]
+        with progress.task("이미지 다운로드 중..."):
+            result = Requester.send("GET", base_address + name, headers=headers)
+        if result.status_code == 304 and headers:
+            entry["time"] = time()
+        else:
+            result.raise_for_status()
+            digest = hashlib.sha256(result.content).hexdigest()
+            os.makedirs(image_dir, exist_ok=True)
+            path = os.path.join(image_dir, digest + ".png")
+            if not os.path.exists(path):
+                fd, tmp = tempfile.mkstemp(dir=image_dir)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(result.content)
+                os.replace(tmp, path)
+            entry = {
+                "hash": digest,
+                "etag": result.headers.get("ETag"),
+                "last-modified": result.headers.get("Last-Modified"),
+                "time": time(),
+                "variants": entry["variants"] if entry and entry["hash"] == digest else {},
+            }
+        image_cache.set(name, entry)
+        image_cache.save()
+        return entry
+
+    def meals(self, dates):
+        """
+        여러 날짜의 급식을 meal_store에서 찾고, 없는 날만 동시에 받아옴
+
+        Args:
+            dates (list): yyyymmdd 문자열 목록
+
+        Returns:
+            dict: {yyyymmdd: 급식 또는 None}
+        """
+        return dict(self.iter_meals(dates))
+
+    def iter_meals(self, dates):
+        """meals와 같지만 (yyyymmdd, 급식)을 날짜 순서대로 받는 즉시 하나씩 돌려줌"""
+        missing = [d for d in dates if not meal_store.has(d)]
+        if not missing:
+            for d in dates:
+                yield d, meal_store.get(d)
+            return
+        today = datetime.now().strftime("%Y%m%d")
+        workers = min(len(missing), int(config.get("meal-workers") or 4))
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            tasks = {d: executor.submit(self.meal, d) for d in missing}
+            for d in dates:
+                if d not in tasks:
+                    yield d, meal_store.get(d)
+                    continue
+                data = tasks[d].result()
+                # 아직 안 올라온 미래의 급식은 나중에 다시 받아야 하므로 저장하지 않음
+                if data is not None or d <= today:
+                    meal_store.set(d, data)
+                yield d, data
+        meal_store.save()
+
     def check_update(self):
-        next_ver = requests.get(
-            "https://raw.githubusercontent.com/chanhyokpark/dshs-app-cli/main/version"
+        next_ver = Requester.send(
+            "GET",
+            "https://raw.githubusercontent.com/chanhyokpark/dshs-app-cli/main/version",
         ).text
         return {
             "update": next_ver.strip() != version,
@@ -283,6 +1362,77 @@ class Client:
         res = self.requester.get("penalties", d)
         return res
 
+    def sync_penalties(self):
+        """
+        마지막으로 동기화한 날짜에서 sync-overlap일(기본값 7) 전부터 다시 받아서 로컬 기록을 갱신함
+
+        Returns:
+            int: 받은 기록 수
+        """
+        f = db.sync_start("penalties")
+        res = self.penalty(f)
+        records = []
+        for d in res["data"]:
+            day = kst_time(d["date"]).strftime("%Y%m%d")
+            giver = d["giver"]["name"] if d.get("giver") else ""
+            key = str(d["id"]) if d.get("id") is not None else "|".join(
+                [d["date"], str(d["points"]), d["reason"] or "", giver]
+            )
+            records.append((key, day, d["date"], d["points"], d["reason"], giver))
+        db.replace("penalties", f, records, total=res["total"])
+        return len(records)
+
+    def sync_outrequests(self):
+        """
+        sync_penalties처럼 외출 신청 기록을 로컬 기록에 맞춤
+
+        Returns:
+            int: 받은 기록 수
+        """
+        f = db.sync_start("outrequests")
+        res = self.get_outrequests(f) or []
+        records = []
+        for d in res:
+            start = kst_time(d["from"])
+            key = str(d["id"]) if d.get("id") is not None else "|".join(
+                [d["from"], d["to"], str(d.get("category")), d.get("reason") or ""]
+            )
+            records.append((
+                key,
+                start.strftime("%Y%m%d"),
+                start.strftime("%Y-%m-%d %H:%M"),
+                kst_time(d["to"]).strftime("%Y-%m-%d %H:%M"),
+                None if d.get("category") is None else str(d["category"]),
+                d.get("reason"),
+                None if d.get("status") is None else str(d["status"]),
+            ))
+        db.replace("outrequests", f, records)
+        return len(records)
+
+    def create_outrequests(self, items):
+        """
+        외출 신청 여러 개를 동시에 보냄
+
+        Args:
+            items: (from_date, to_date, category, reason) 튜플 목록
+
+        Returns:
+            list: items 순서대로 (성공 여부, 실패 사유)
+        """
+        def attempt(item):
+            try:
+                res = self.create_outrequest(*item)
+            except Exception as e:
+                response = getattr(e, "response", None)
+                return False, f"HTTP {response.status_code}" if response is not None else type(e).__name__
+            if isinstance(res, dict) and res.get("error"):
+                return False, res["error"]
+            return True, ""
+
+        workers = max(1, min(len(items), int(config.get("pool-size") or 4)))
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(attempt, items))
+
     @error_handler
     def get_outrequests(self, f=None, t=None):
         d = {}
@@ -324,7 +1474,7 @@ class Client:
     @error_handler
     def get_code(self, code=None, browser=True):
         c = code
-        url = f"{auth_address}?client_id={client_id}&redirect_uri={base_address}code"
+        url = f"{auth_address}?client_id={client_id()}&redirect_uri={base_address}code"
         if not c and is_interactive:
             if browser:
                 print("코드를 붙여넣으세요: ", end="")
@@ -348,9 +1498,11 @@ class Client:
         exit(0)
 
     @error_handler
-    def get_space_room(self, room):
+    def get_space_room(self, room, refresh=False):
         try:
-            res = self.requester.get(f"spaces/rooms/{room}")
+            res = self.requester.get_cached(
+                f"spaces/rooms/{room}", layout_cache, self.layout_ttl(), refresh
+            )
             return res
         except requests.exceptions.HTTPError as e:
             if e.response is not None and e.response.status_code == 404:
@@ -360,9 +1512,11 @@ class Client:
                 raise e
 
     @error_handler
-    def get_space_area(self, area):
+    def get_space_area(self, area, refresh=False):
         try:
-            res = self.requester.get(f"spaces/areas/{area}")
+            res = self.requester.get_cached(
+                f"spaces/areas/{area}", layout_cache, self.layout_ttl(), refresh
+            )
             return res
         except requests.exceptions.HTTPError as e:
             if e.response is not None and e.response.status_code == 404:
@@ -372,10 +1526,10 @@ class Client:
                 raise e
 
     @error_handler
-    def get_area(self, date: datetime, area):
+    def get_area(self, date: datetime, area, live=False):
         try:
             res = self.requester.get(
-                f"reservations/{date.strftime('%Y%m%d')}/areas/{area}"
+                f"reservations/{date.strftime('%Y%m%d')}/areas/{area}", cached=not live
             )
             return res
         except requests.exceptions.HTTPError as e:
@@ -399,6 +1553,25 @@ class Client:
             else:
                 raise e
 
+    def full_room(self, date: datetime, room, refresh=False):
+        """
+        자습실의 모든 구역 배치와 신청 현황을 동시에 받아서 좌석표 하나로 만듦
+        배치는 layout_cache에 있으면 요청하지 않으므로 보통 구역별 신청 현황 요청만 한 번에 나감
+
+        Returns:
+            tuple: (자습실 정보, SeatMap)
+        """
+        room_info = self.get_space_room(room, refresh)
+        areas = [a["area_name"] for a in room_info["areas"]]
+        responses = self.gather(
+            *[(self.get_area, date, area) for area in areas],
+            *[(self.get_space_area, area, refresh) for area in areas],
+        )
+        seatmap = SeatMap()
+        for i, area in enumerate(areas):
+            seatmap.add_area(area, responses[len(areas) + i], responses[i])
+        return room_info, seatmap
+
     @error_handler
     def search(self, date: datetime, query):
         try:
@@ -417,6 +1590,102 @@ class Client:
             else:
                 raise e
 
+    def scan_occupancy(self, days, rooms):
+        """
+        날짜 x 자습실마다 구역별 신청 수를 받아 occupancy 테이블에 저장함
+        자습실 하나의 구역별 신청 수는 get_room 요청 한 번으로 받으며, 지난 날짜는 바뀌지 않으므로 저장된 것은 다시 받지 않음
+        occupancy-workers(기본값 pool-size)개가 동시에, 합쳐서 초당 occupancy-rate(기본값 10)회까지 요청함
+
+        Returns:
+            tuple: (받은 수, 실패한 수)
+        """
+        today = datetime.now().strftime("%Y%m%d")
+        layouts = dict(zip(rooms, self.gather(*[(self.get_space_room, room) for room in rooms])))
+        # 그날이 끝난 뒤에 받은 것만 확정된 기록으로 봄
+        stored = {
+            (r["day"], r["area"])
+            for r in db.query(
+                "SELECT day, area, time FROM occupancy WHERE day >= ? AND day <= ?",
+                (min(days), max(days)),
+            )
+            if r["time"] >= (datetime.strptime(r["day"], "%Y%m%d") + timedelta(days=1)).timestamp()
+        }
+        todo = [
+            (day, room)
+            for day in days
+            for room in rooms
+            if day >= today
+            or any((day, a["area_name"]) not in stored for a in layouts[room]["areas"])
+        ]
+        if not todo:
+            return 0, 0
+        limiter = RateLimiter(float(config.get("occupancy-rate") or 10))
+
+        def fetch(cell):
+            day, room = cell
+            limiter.wait()
+            try:
+                return self.get_room(datetime.strptime(day, "%Y%m%d"), room)
+            except Exception:
+                return None
+
+        workers = min(
+            len(todo), int(config.get("occupancy-workers") or config.get("pool-size") or 4)
+        )
+        records = []
+        failed = 0
+        with progress.task(f"자습실 신청 현황 {len(todo)}개 조회 중..."):
+            with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                for (day, room), res in zip(todo, executor.map(fetch, todo)):
+                    if res is None:
+                        failed += 1
+                        continue
+                    counts = SeatMap.from_room(layouts[room], res).counts
+                    records += [(day, area, o, c, time()) for area, (o, c) in counts.items()]
+        with db.transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO occupancy VALUES (?, ?, ?, ?, ?)", records)
+        return len(todo) - failed, failed
+
+    def search_many(self, date: datetime, queries):
+        """
+        여러 학생을 search-workers(기본값 pool-size)개씩 동시에 검색함
+        404(없는 학생), 422(동명이인) 응답은 search_cache에 날짜별로 저장해서 다시 묻지 않음
+
+        Returns:
+            dict: {검색어: 검색 결과 또는 상태 코드(404, 422)}
+        """
+        day = date.strftime("%Y%m%d")
+        misses = dict(search_cache.get(day) or {})
+        results = {q: misses[q] for q in queries if q in misses}
+        todo = [q for q in queries if q not in results]
+
+        @error_handler
+        def search(query):
+            try:
+                return self.requester.get(f"reservations/{day}/search", {"q": query})
+            except requests.exceptions.HTTPError as e:
+                if e.response is not None and e.response.status_code in [404, 422]:
+                    return e.response.status_code
+                raise e
+
+        if todo:
+            workers = min(
+                len(todo), int(config.get("search-workers") or config.get("pool-size") or 4)
+            )
+            with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                for query, res in zip(todo, executor.map(search, todo)):
+                    results[query] = res
+                    if res in [404, 422]:
+                        misses[query] = res
+            if misses != (search_cache.get(day) or {}):
+                today = datetime.now().strftime("%Y%m%d")
+                for d in list(search_cache.config):
+                    if d < today:
+                        search_cache.delete(d)
+                search_cache.set(day, misses)
+                search_cache.save()
+        return results
+
     @error_handler
     def search_me(self, date: datetime):
         # res = self.requester.get(f"reservations/{date.strftime('%Y%m%d')}")
@@ -444,102 +1713,394 @@ class Client:
                 else:
                     raise e
 
+    def reserve_attempt(self, date: datetime, seat):
+        """
+        error_handler 없이 신청을 한 번 보냄
 
-parser = argparse.ArgumentParser(description="dshs.app CLI")
-# parser.register("action", "parsers", AliasedSubParsersAction)
-subparsers = parser.add_subparsers(dest="command")
-subparsers.required = False
-auth_parser = subparsers.add_parser("auth", aliases=["a"], help="로그인")
-auth_parser.add_argument("-c", "--code", dest="code", required=False)
-auth_parser.add_argument(
-    "-l",
-    "--link",
-    dest="link",
-    required=False,
-    default=False,
-    action="store_true",
-    help="웹페이지를 열지 않고 링크만 제공",
-)
-update_parser = subparsers.add_parser("update", help="이 앱 업데이트")
-update_parser.add_argument(
-    "-p", "--pull", action="store_true", dest="pull", help="업데이트가 감지되면 바로 git pull 실행"
-)
-update_parser.add_argument(
-    "-f", "--force", action="store_true", dest="force", help="강제로 업데이트"
-)
-userinfo_parser = subparsers.add_parser("userinfo", help="사용자 정보")
-userinfo_parser.add_argument(
-    "field", nargs="?", help="name, student_id 등 필드, 비어 있으면 전체 json 출력"
-)
-penalty_parser = subparsers.add_parser("penalty", aliases=["p"], help="벌점 확인")
-penalty_parser.add_argument(
-    "-p", "--point", dest="only_points", action="store_true", help="기록을 보여주지 않고 점수만 확인"
-)
-penalty_parser.add_argument(
-    "-a",
-    "--all",
-    dest="recent",
-    action="store_true",
-    default=False,
-    help="전체 벌점 내역 확인(기본값: 7일 전~오늘)",
-)
-
-meal_parser = subparsers.add_parser("meal", help="급식 조회")
-meal_parser.add_argument(
-    "date",
-    nargs="?",
-    default=datetime.now().strftime("%Y%m%d"),
-    help="yyyymmdd 또는 mmdd 포맷의 날짜, 기본값은 오늘",
-)
-
-reserve_parser = subparsers.add_parser("reserve", help="자습 신청", aliases=["r", "rt"])
-reserve_parser.add_argument(
-    "-d",
-    "--date",
-    dest="date",
-    default="today",
-    help="날짜 (YYYYMMDD 또는 today/tomorrow, 기본값은 today, 'rt' 명령어를 사용하면 tomorrow로 고정 )",
-)
-reserve_parser.add_argument(
-    "-c",
-    "--create",
-    dest="create",
-    action="store_true",
-    default=False,
-    help="해당 장소에 신청(좌석을 검색했을 때만 가능)",
-)
-reserve_parser.add_argument(
-    "q",
-    nargs="?",
-    help="검색어(자습실, 구역, 좌석, 사용자 이름 또는 별칭, 사용자 학번, me는 자신의 학습 장소, 자습실을 검색했을 때 터미널이 iterm이거나 wezterm이고, 패키지 imgcat와 PIL을 설치하면 자습실 이미지가 제공됨니다)",
-)
-args = parser.parse_args()
-api = Client()
-
-
-def print_table(data, vertical=False):  # 3d 배열
-    str_tables = []
-    res = ""
-    for t in data:
-        str_tables.append(
-            tabulate(t, headers=[], tablefmt="fancy_grid", stralign="center")
-        )
+        Returns:
+            tuple: (상태 코드, 실패 사유 또는 None, 걸린 시간(ms)), 연결에 실패하면 상태 코드는 None
+        """
+        start = perf_counter()
+        try:
+            res = Requester.send(
+                "POST",
+                api_address + f"reservations/{date.strftime('%Y%m%d')}",
+                data={"room_name": seat[0], "area_name": seat[:2], "seat_name": seat},
+                headers=self.requester.header,
+            )
+        except Exception as e:
+            return None, str(e), (perf_counter() - start) * 1000
+        latency = (perf_counter() - start) * 1000
+        reason = None
+        if res.status_code >= 400:
+            try:
+                reason = res.json()["error"]
+            except Exception:
+                reason = f"HTTP {res.status_code}"
+        return res.status_code, reason, latency
+
+    def clock_offset(self, samples=8):
+        """
+        서버 Date 헤더로 (서버 시각 - 내 시각) 추정
+        Date는 초 단위이므로 요청을 1초 안에 고르게 나눠 보내서 가능한 범위를 좁힘
+
+        Returns:
+            tuple: (추정값, 오차 범위) 초 단위
+        """
+        lo, hi = float("-inf"), float("inf")
+        midpoints = []
+        for i in range(samples):
+            t0 = time()
+            res = Requester.send("HEAD", base_address)
+            t1 = time()
+            server = email_utils.parsedate_to_datetime(res.headers["Date"]).timestamp()
+            lo = max(lo, server - t1)
+            hi = min(hi, server + 1 - t0)
+            midpoints.append(server + 0.5 - (t0 + t1) / 2)
+            sleep(1 / samples)
+        if lo > hi:
+            # 범위가 겹치지 않으면(서버 시계가 흔들림) 중앙값 사용
+            return sorted(midpoints)[len(midpoints) // 2], 0.5
+        return (lo + hi) / 2, (hi - lo) / 2
+
+    def warm_up(self, connections=1):
+        """연결을 미리 열어 둠. 동시에 보내야 연결이 여러 개 열림"""
+        self.gather(*[(Requester.send, "HEAD", base_address)] * connections)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="dshs.app CLI")
+    # parser.register("action", "parsers", AliasedSubParsersAction)
+    parser.add_argument(
+        "--format",
+        dest="format",
+        choices=["json", "ndjson", "tsv"],
+        help="표 대신 기계가 읽을 수 있는 형식으로 출력 (색, 진행 표시 없음)",
+    )
+    parser.add_argument(
+        "--offline",
+        dest="offline",
+        action="store_true",
+        help="서버에 연결하지 않고 저장된 응답만 사용",
+    )
+    parser.add_argument(
+        "--trace",
+        dest="trace",
+        metavar="FILE",
+        help="요청, 해석, 그리기 구간을 Chrome trace 형식(chrome://tracing, Perfetto)으로 저장",
+    )
+    parser.add_argument(
+        "--timings", dest="timings", action="store_true", help="구간별 걸린 시간을 stderr로 출력"
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = False
+    auth_parser = subparsers.add_parser("auth", aliases=["a"], help="로그인")
+    auth_parser.add_argument("-c", "--code", dest="code", required=False)
+    auth_parser.add_argument(
+        "-l",
+        "--link",
+        dest="link",
+        required=False,
+        default=False,
+        action="store_true",
+        help="웹페이지를 열지 않고 링크만 제공",
+    )
+    update_parser = subparsers.add_parser("update", help="이 앱 업데이트")
+    update_parser.add_argument(
+        "-p", "--pull", action="store_true", dest="pull", help="업데이트가 감지되면 바로 git pull 실행"
+    )
+    update_parser.add_argument(
+        "-f", "--force", action="store_true", dest="force", help="강제로 업데이트"
+    )
+    userinfo_parser = subparsers.add_parser("userinfo", help="사용자 정보")
+    userinfo_parser.add_argument(
+        "field", nargs="?", help="name, student_id 등 필드, 비어 있으면 전체 json 출력"
+    )
+    penalty_parser = subparsers.add_parser("penalty", aliases=["p"], help="벌점 확인")
+    penalty_parser.add_argument(
+        "-p", "--point", dest="only_points", action="store_true", help="기록을 보여주지 않고 점수만 확인"
+    )
+    penalty_parser.add_argument(
+        "-a",
+        "--all",
+        dest="recent",
+        action="store_true",
+        default=False,
+        help="전체 벌점 내역 확인(기본값: 7일 전~오늘)",
+    )
+    penalty_parser.add_argument(
+        "-s", "--sync", dest="sync", action="store_true", help="서버에서 새 벌점 기록을 받아 로컬 기록 갱신"
+    )
+    penalty_parser.add_argument("--from", dest="f", help="YYYYMMDD부터의 기록")
+    penalty_parser.add_argument("--to", dest="t", help="YYYYMMDD까지의 기록")
+    penalty_parser.add_argument(
+        "--by", dest="by", choices=["teacher", "month"], help="교사별 또는 월별 합계(--from이 없으면 전체 기록)"
+    )
+
+    occupancy_parser = subparsers.add_parser("occupancy", help="날짜별, 구역별 자습 신청 현황 통계")
+    occupancy_parser.add_argument(
+        "--from",
+        dest="f",
+        default=(datetime.now() - timedelta(days=13)).strftime("%Y%m%d"),
+        help="yyyymmdd 또는 mmdd 포맷의 시작 날짜, 기본값은 13일 전",
+    )
+    occupancy_parser.add_argument(
+        "--to", dest="t", default=datetime.now().strftime("%Y%m%d"), help="끝 날짜, 기본값은 오늘"
+    )
+    occupancy_parser.add_argument(
+        "--rooms", dest="rooms", default="a,b,s", help="자습실 목록(쉼표로 구분), 기본값은 a,b,s"
+    )
+    occupancy_parser.add_argument("--csv", dest="csv", help="CSV로 저장할 파일, - 이면 표준 출력")
+
+    out_parser = subparsers.add_parser("out", aliases=["o"], help="외출 신청 조회/신청")
+    out_parser.add_argument(
+        "-a", "--all", dest="all", action="store_true", help="지난 기록까지 전체 조회(기본값: 오늘부터)"
+    )
+    out_parser.add_argument(
+        "-s", "--sync", dest="sync", action="store_true", help="서버에서 새 외출 기록을 받아 로컬 기록 갱신"
+    )
+    out_parser.add_argument("--from", dest="f", help="YYYYMMDD부터의 기록")
+    out_parser.add_argument("--to", dest="t", help="YYYYMMDD까지의 기록")
+    out_parser.add_argument("-c", "--category", dest="category", help="분류")
+    out_parser.add_argument(
+        "-n",
+        "--new",
+        dest="new",
+        metavar="HH:MM-HH:MM",
+        help="외출 신청, 끝 시각이 시작 시각보다 빠르면 다음 날로 봄",
+    )
+    out_parser.add_argument(
+        "-d",
+        "--date",
+        dest="date",
+        default=datetime.now().strftime("%Y%m%d"),
+        help="신청할 날짜, yyyymmdd 또는 mmdd 포맷, 1020..1031처럼 범위 지정 가능, 기본값은 오늘",
+    )
+    out_parser.add_argument(
+        "--every", dest="every", help="범위 중 신청할 요일, 예: 월,수,금"
+    )
+    out_parser.add_argument("-r", "--reason", dest="reason", help="사유")
+
+    subparsers.add_parser("stats", help="연결 재사용 통계")
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="파일의 명령어들을 한 번에 실행(조회 명령어는 동시에 실행, 출력은 입력 순서대로)"
+    )
+    batch_parser.add_argument("file", help="한 줄에 명령어 하나씩 적은 파일, - 이면 표준 입력, #으로 시작하는 줄은 무시")
+    batch_parser.add_argument(
+        "-j", "--jobs", dest="jobs", type=int, help="동시에 실행할 명령어 수(기본값: pool-size)"
+    )
+
+    daemon_parser = subparsers.add_parser(
+        "daemon", help="명령어를 빠르게 실행하도록 연결과 캐시를 유지하는 백그라운드 프로세스 실행"
+    )
+    daemon_parser.add_argument(
+        "-s", "--stop", dest="stop", action="store_true", help="실행 중인 daemon 종료"
+    )
+
+    meal_parser = subparsers.add_parser("meal", help="급식 조회")
+    meal_parser.add_argument(
+        "date",
+        nargs="?",
+        default=datetime.now().strftime("%Y%m%d"),
+        help="yyyymmdd 또는 mmdd 포맷의 날짜, 1020..1031처럼 범위 지정 가능, 기본값은 오늘",
+    )
+    meal_parser.add_argument(
+        "-w", "--week", dest="week", action="store_true", help="해당 날짜가 있는 주(월~일)의 급식"
+    )
+    meal_parser.add_argument(
+        "-m", "--month", dest="month", action="store_true", help="해당 날짜가 있는 달의 급식"
+    )
+
+    reserve_parser = subparsers.add_parser("reserve", help="자습 신청", aliases=["r", "rt"])
+    reserve_parser.add_argument(
+        "-d",
+        "--date",
+        dest="date",
+        default="today",
+        help="날짜 (YYYYMMDD 또는 today/tomorrow, 기본값은 today, 'rt' 명령어를 사용하면 tomorrow로 고정 )",
+    )
+    reserve_parser.add_argument(
+        "-c",
+        "--create",
+        dest="create",
+        action="store_true",
+        default=False,
+        help="해당 장소에 신청(좌석을 검색했을 때만 가능)",
+    )
+    reserve_parser.add_argument(
+        "-q",
+        "--query",
+        dest="queries",
+        help="여러 학생(이름, 별칭, 학번)을 쉼표로 구분해서 한 번에 검색",
+    )
+    reserve_parser.add_argument(
+        "--query-file",
+        dest="query_file",
+        help="검색할 학생 목록 파일(한 줄에 하나 또는 쉼표로 구분, -는 표준 입력)",
+    )
+    reserve_parser.add_argument(
+        "--at",
+        dest="at",
+        help="-c와 같이 사용, 서버 시계 기준으로 오늘 HH:MM[:SS]에 맞춰 신청",
+    )
+    reserve_parser.add_argument(
+        "--then",
+        dest="then",
+        help="--at과 같이 사용, 신청에 실패하면 이어서 시도할 좌석 목록(쉼표로 구분)",
+    )
+    reserve_parser.add_argument(
+        "--parallel",
+        dest="parallel",
+        action="store_true",
+        default=False,
+        help="--then의 좌석들을 순서대로 시도하지 않고 한꺼번에 신청",
+    )
+    reserve_parser.add_argument(
+        "-w",
+        "--watch",
+        dest="watch",
+        action="store_true",
+        default=False,
+        help="구역의 신청 현황을 계속 확인하며 바뀐 부분만 다시 표시(-c와 같이 쓰면 좌석이 비었을 때 바로 신청)",
+    )
+    reserve_parser.add_argument(
+        "-f",
+        "--full",
+        dest="full",
+        action="store_true",
+        default=False,
+        help="자습실을 검색했을 때 모든 구역의 좌석표를 한 번에 표시",
+    )
+    reserve_parser.add_argument(
+        "-R",
+        "--refresh",
+        dest="refresh",
+        action="store_true",
+        default=False,
+        help="저장된 자습실/구역 배치를 무시하고 새로 받기",
+    )
+    reserve_parser.add_argument(
+        "q",
+        nargs="?",
+        help="검색어(자습실, 구역, 좌석, 사용자 이름 또는 별칭, 사용자 학번, me는 자신의 학습 장소, 자습실을 검색했을 때 터미널이 iterm이거나 wezterm이고, 패키지 imgcat와 PIL을 설치하면 자습실 이미지가 제공됨니다)",
+    )
+    return parser
+
+
+
+
+def parse_day(s, year=None):
+    if len(s) == 4:
+        return datetime.strptime(str(year or datetime.now().year) + s, "%Y%m%d")
+    return datetime.strptime(s, "%Y%m%d")
+
+
+def kst_time(s):
+    """서버의 ISO 시각 문자열을 한국 시간으로. 시간대가 없으면 이미 한국 시간으로 봄"""
+    t = datetime.fromisoformat(s.replace("Z", "+00:00"))
+    if t.tzinfo is None:
+        return t
+    return t.astimezone(timezone(timedelta(hours=9))).replace(tzinfo=None)
+
+
+def day_range(s):
+    """yyyymmdd 또는 1230..0102 같은 범위, 연도 없이 쓴 끝 날짜가 시작 날짜보다 앞이면 다음 해로 봄"""
+    if ".." in s:
+        f, t = s.split("..", 1)
+        start = parse_day(f)
+        end = parse_day(t, start.year)
+        if end < start and len(t) == 4:
+            end = parse_day(t, start.year + 1)
+        if end < start:
+            logger.error(f"'{s}': 끝 날짜가 시작 날짜보다 앞입니다.")
+            raise Exception
+        return start, end
+    return parse_day(s), parse_day(s)
+
+
+def out_items(args):
+    """--new, --date, --every로 지정한 외출 신청 목록"""
+    weekdays = "월화수목금토일"
+    start_time, end_time = [
+        datetime.strptime(s.strip(), "%H:%M").time() for s in args.new.split("-", 1)
+    ]
+    start, end = day_range(args.date)
+    every = None
+    if args.every:
+        every = {weekdays.find(s.strip()[:1]) for s in args.every.split(",") if s.strip()}
+        if -1 in every:
+            logger.error("--every에는 월,화,수,목,금,토,일 중에서 입력하세요")
+            raise Exception
+    items = []
+    for i in range((end - start).days + 1):
+        day = start + timedelta(days=i)
+        if every is not None and day.weekday() not in every:
+            continue
+        f = datetime.combine(day, start_time)
+        t = datetime.combine(day, end_time)
+        if t <= f:
+            t += timedelta(days=1)
+        items.append((f, t, args.category, args.reason))
+    return items
+
+
+def meal_dates(args):
+    start, end = day_range(args.date)
+    if args.week:
+        start = start - timedelta(days=start.weekday())
+        end = start + timedelta(days=6)
+    elif args.month:
+        start = start.replace(day=1)
+        end = (start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    return [
+        (start + timedelta(days=i)).strftime("%Y%m%d")
+        for i in range((end - start).days + 1)
+    ]
+
+
+ansi_pattern = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+
+@lru_cache(maxsize=4096)
+def display_width(s):
+    """ANSI 코드를 뺀 터미널 표시 폭(한글은 2칸)"""
+    s = ansi_pattern.sub("", s)
+    if s.isascii():
+        return len(s)
+    width = wcwidth.wcswidth(s)
+    return width if width >= 0 else len(s)
+
+
+def join_horizontal(blocks, gap=3):
+    """여러 줄 문자열들을 한 번에 옆으로 이어 붙임"""
+    splitted = [b.split("\n") for b in blocks]
+    widths = [max(display_width(line) for line in lines) for lines in splitted]
+    height = max(len(lines) for lines in splitted)
+    res = []
+    for j in range(height):
+        row = []
+        for lines, w in zip(splitted, widths):
+            line = lines[j] if j < len(lines) else ""
+            row.append(line + " " * (w - display_width(line) + gap))
+        res.append("".join(row))
+    return "\n".join(res) + "\n"
+
+
+def render_table(data, vertical=False):  # 3d 배열
+    with tracer.span("tabulate", "render", tables=len(data)):
+        str_tables = [
+            tabulate.tabulate(t, headers=[], tablefmt="fancy_grid", stralign="center")
+            for t in data
+        ]
     if vertical:
-        res = ("\n" * 2).join(str_tables)
-    else:
-        max_r = max((len(d.split("\n")) for d in str_tables))
-        c = tuple(len(d.split("\n")[0]) for d in str_tables)
-        s = "\n" * max_r
-        for i, t in enumerate(str_tables):
-            sp = t.split("\n")
-            for j in range(max_r):
-                if len(sp) > j:
-                    s = s.replace("\n", sp[j] + " " * 3 + "*", 1)
-                else:
-                    s = s.replace("\n", " " * (c[i] + 3) + "*", 1)
-            s = s.replace("*", "\n")
-        res = s
-    width = len(res.split("\n")[0])
+        return ("\n" * 2).join(str_tables)
+    return join_horizontal(str_tables)
+
+
+def print_table(data, vertical=False):
+    res = render_table(data, vertical)
+    width = display_width(res[: res.find("\n")] if "\n" in res else res)
     try:
         if width > os.get_terminal_size().columns:
             logger.warning("터미널 크기가 너무 작습니다. 크기 변경을 시도합니다.")
@@ -553,277 +2114,1241 @@ def print_table(data, vertical=False):  # 3d 배열
     print(res)
 
 
-def transform_table(r, c, seats, reserve_dict, highlight_seat, student_id, disabled):
-    result = [[] for i in range(r)]
-    keys = reserve_dict.keys()
-    for i in range(r):
-        for j in range(c):
-            seat = seats[i * c + j]
-            if seat in keys:
-                d = reserve_dict[seat]
-                seat = (
-                    ((bold + bg_blue) if highlight_seat == seat else "")
-                    + (red if d["student_id"] == student_id else grey)
-                    + (seat if seat != "0" else "")
-                    + reset
-                )
-                name = d["name"]
-                if "alias" in d.keys() and d["alias"] is not None:
-                    name = d["alias"]
-                seat += f"\n{name}"
-            else:
-                seat = (
-                    ((bold + bg_blue) if highlight_seat == seat else "")
-                    + (grey if disabled else green)
-                    + (seat if seat != "0" else "")
-                    + reset
-                )
-                seat += "\n-"
-            result[i].append(seat)
-    return result
-
-
-def transform_reserve(reserve_data):
-    reserve_dict = {}
-    if not reserve_data:
-        return {}
-    for d in reserve_data["seats"]:
-        reserve_dict[d["seat_name"]] = d["user"]
-    return reserve_dict
-
-
-def process_table(
-    area_seats_data, area_reserve_data, highlight_seat, student_id, disabled
-):
-    table_data = []
-    reserve_dict = transform_reserve(area_reserve_data)
-    for t in area_seats_data["tables"]:
-        table_data.append(
-            transform_table(
-                t["r"],
-                t["c"],
-                t["data"],
-                reserve_dict,
-                highlight_seat,
-                student_id,
-                disabled,
-            )
+class SeatMap:
+    """
+    구역 배치와 예약 현황을 한 번에 색인해 둔 좌석표
+    응답마다 한 번만 만들고 좌석 이름, 학번, 빈 좌석/찬 좌석, 구역별 신청 현황을 바로 찾음
+    """
+
+    __slots__ = ("tables", "vertical", "users", "by_student", "occupied", "free", "counts")
+
+    def __init__(self):
+        self.tables = {}  # 구역: [(r, c, 좌석 목록), ...]
+        self.vertical = {}
+        self.users = {}  # 좌석: 사용자
+        self.by_student = {}  # 학번: 좌석
+        self.occupied = set()
+        self.free = set()
+        self.counts = {}  # 구역: (신청 수, 좌석 수)
+
+    @classmethod
+    def from_room(cls, room_info, room_reserve_info):
+        """자습실 조회 결과로 구역별 신청 현황만 채운 좌석표"""
+        seatmap = cls()
+        for info, reserve_info in zip(room_info["areas"], room_reserve_info["areas"]):
+            seatmap.counts[info["area_name"]] = (reserve_info["occupied"], info["count"])
+        return seatmap
+
+    def add_area(self, area, area_info, area_reserve_info=None):
+        self.tables[area] = [(t["r"], t["c"], t["data"]) for t in area_info["tables"]]
+        self.vertical[area] = area_info["vertical"]
+        seats = {s for t in area_info["tables"] for s in t["data"] if s != "0"}
+        if area_reserve_info:
+            for d in area_reserve_info["seats"]:
+                self.users[d["seat_name"]] = d["user"]
+                self.by_student[str(d["user"]["student_id"])] = d["seat_name"]
+        occupied = seats & self.users.keys()
+        self.occupied |= occupied
+        self.free |= seats - occupied
+        self.counts[area] = (
+            area_reserve_info["occupied"] if area_reserve_info else 0,
+            area_info["count"],
         )
-    print_table(table_data, area_seats_data["vertical"])
+        return self
+
+    def user(self, seat):
+        return self.users.get(seat)
+
+    def seat_of(self, student_id):
+        return self.by_student.get(str(student_id))
+
+    def is_free(self, seat):
+        return seat in self.free
+
+    def name(self, seat):
+        user = self.users[seat]
+        return user["alias"] if user.get("alias") is not None else user["name"]
+
+    def table_data(self, area, highlight_seat, student_id, disabled):
+        """print_table에 넘길 3차원 배열, highlight_seat은 좌석 하나 또는 좌석 집합"""
+        highlights = {highlight_seat} if isinstance(highlight_seat, str) else highlight_seat
+        mine = self.seat_of(student_id)
+        result = []
+        for r, c, seats in self.tables[area]:
+            table = []
+            for i in range(r):
+                row = []
+                for seat in seats[i * c : (i + 1) * c]:
+                    cell = ((bold + bg_blue) if seat in highlights else "") + (
+                        (red if seat == mine else grey)
+                        if seat in self.occupied
+                        else (grey if disabled else green)
+                    )
+                    cell += (seat if seat != "0" else "") + reset
+                    cell += f"\n{self.name(seat)}" if seat in self.occupied else "\n-"
+                    row.append(cell)
+                table.append(row)
+            result.append(table)
+        return result
+
+
+def occupancy_grid(args, api):
+    """--from~--to, --rooms의 신청 현황을 받아서 (날짜 목록, occupancy 테이블 행 목록)을 돌려줌"""
+    start, end = day_range(f"{args.f}..{args.t}")
+    days = [(start + timedelta(days=i)).strftime("%Y%m%d") for i in range((end - start).days + 1)]
+    rooms = [r.strip() for r in args.rooms.split(",") if r.strip()]
+    if not days or not rooms:
+        logger.error("날짜 범위와 자습실을 확인하세요")
+        raise Exception
+    fetched, failed = api.scan_occupancy(days, rooms)
+    if failed:
+        logger.warning(f"{failed}개 조회 실패")
+    rows = db.query(
+        "SELECT * FROM occupancy WHERE day >= ? AND day <= ? AND ("
+        + " OR ".join(["area LIKE ?"] * len(rooms))
+        + ") ORDER BY area, day",
+        [days[0], days[-1]] + [room + "%" for room in rooms],
+    )
+    return days, rows
+
+
+def render_heatmap(days, rows):
+    """구역마다 한 줄, 날짜마다 두 칸으로 신청 비율을 색과 음영으로 표시"""
+    shades = " ░▒▓█"
+    cells = {(r["day"], r["area"]): (r["occupied"], r["count"]) for r in rows}
+    areas = sorted({r["area"] for r in rows})
+    months = ""
+    skip = 0
+    for i, d in enumerate(days):
+        if skip:
+            skip -= 1
+        elif i == 0 or d[6:] == "01":
+            label = f"{int(d[4:6])}월"
+            skip = (display_width(label) + 1) // 2 - 1
+            months += label + " " * ((skip + 1) * 2 - display_width(label))
+        else:
+            months += "  "
+    lines = [" " * 5 + months, " " * 5 + "".join(d[6:] for d in days)]
+    for area in areas:
+        line = f"{area:5}"
+        ratios = []
+        for day in days:
+            occupied, count = cells.get((day, area), (None, 0))
+            if occupied is None or not count:
+                line += grey + "··" + reset
+                continue
+            ratio = occupied / count
+            ratios.append(ratio)
+            color = red if ratio >= 0.8 else (yellow if ratio >= 0.5 else green)
+            line += color + shades[min(4, int(ratio * 4 + 0.999))] * 2 + reset
+        if ratios:
+            line += f" 평균 {bold}{sum(ratios) / len(ratios):4.0%}{reset} 최대 {max(ratios):4.0%}"
+        lines.append(line)
+    lines.append(
+        f"░ ~25% ▒ ~50% ▓ ~75% █ ~100%  {green}50% 미만{reset} {yellow}80% 미만{reset} {red}80% 이상{reset}  {grey}··{reset} 기록 없음"
+    )
+    return "\n".join(lines)
+
+
+def write_occupancy_csv(path, rows):
+    import csv
+
+    f = sys.stdout if path == "-" else open(path, "w", encoding="utf-8", newline="")
+    try:
+        writer = csv.writer(f)
+        writer.writerow(["date", "area", "occupied", "count", "ratio"])
+        for r in rows:
+            writer.writerow(
+                [r["day"], r["area"], r["occupied"], r["count"], round(r["occupied"] / r["count"], 4) if r["count"] else ""]
+            )
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
+def format_count(occupied, count):
+    return f"{bold}{yellow if count > occupied else red}{occupied}{reset}/{bold}{count}{reset}"
 
 
-if not config.get("update-checked"):
-    config.set("update-checked", "19721121")
-if (
-    datetime.now() - datetime.strptime(config.get("update-checked"), "%Y%m%d")
-).days > 3:
+def terminal_pixel_width():
+    """터미널 폭(px), 픽셀 크기를 알려주지 않는 터미널은 칸당 8px로 계산함"""
+    columns = shutil.get_terminal_size().columns
     try:
-        res = api.check_update()
-        if res["update"]:
-            print(f'새 버전: {res["version"]}')
-            print(f'다운로드 링크: {res["download_link"]}')
-        else:
-            config.set("update-checked", datetime.now().strftime("%Y%m%d"))
+        import fcntl
+        import struct
+        import termios
+
+        rows, cols, xpixel, ypixel = struct.unpack(
+            "HHHH", fcntl.ioctl(sys.stdout.fileno(), termios.TIOCGWINSZ, b"\0" * 8)
+        )
+        if xpixel and cols:
+            return xpixel
     except Exception:
         pass
+    return columns * 8
+
+
+def scale_image(source, target, width):
+    """source의 PNG를 폭이 width(px) 이하가 되도록 줄여서 target에 저장"""
+    from PIL import Image
+
+    with Image.open(source) as img:
+        if img.width > width:
+            img = img.resize((width, max(1, img.height * width // img.width)), Image.LANCZOS)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target))
+        with os.fdopen(fd, "wb") as f:
+            img.save(f, format="PNG", optimize=True)
+        os.replace(tmp, target)
+
+
+def render_room(seatmap, student_id):
+    """모든 구역의 신청 현황과 좌석표를 문자열 하나로 그림"""
+    chunks = []
+    for area in seatmap.tables:
+        with tracer.span("transform_table", "render", area=area):
+            data = seatmap.table_data(area, "", student_id, False)
+        chunks.append(
+            f"\n{bold}{area}{reset} 신청 현황: {format_count(*seatmap.counts[area])}\n"
+            + render_table(data, seatmap.vertical[area])
+        )
+    return "".join(chunks)
+
+
+def process_table(seatmap, area, highlight_seat, student_id, disabled):
+    with tracer.span("transform_table", "render", area=area):
+        data = seatmap.table_data(area, highlight_seat, student_id, disabled)
+    with tracer.span("print_table", "render", area=area):
+        print_table(data, seatmap.vertical[area])
+
+
+def diff_seats(previous, current):
+    """신청자가 바뀐 좌석 목록 [(좌석, 이전 사용자, 현재 사용자)]"""
+    changes = []
+    for seat in sorted(previous.users.keys() | current.users.keys()):
+        before, after = previous.user(seat), current.user(seat)
+        if (before or {}).get("student_id") != (after or {}).get("student_id"):
+            changes.append((seat, before, after))
+    return changes
+
+
+# 자습 신청이 열리는 시각, watch-deadlines 키로 바꿀 수 있음
+default_watch_deadlines = ["08:00"]
+
+
+def near_deadline(now, window=300):
+    """watch-deadlines(HH:MM 목록, 기본값은 신청이 열리는 시각) 중 하나가 window초 안에 다가오는지"""
+    deadlines = config.get("watch-deadlines")
+    for deadline in default_watch_deadlines if deadlines is None else deadlines:
+        h, m = map(int, deadline.split(":"))
+        left = (now.replace(hour=h, minute=m, second=0, microsecond=0) - now).total_seconds()
+        if 0 <= left <= window:
+            return True
+    return False
+
+
+def watch_area(api, date, area, seatmap, highlight_seat, student_id, target=None):
+    """
+    구역의 신청 현황만 주기적으로 다시 받아서 바뀐 줄만 다시 그림
+    바뀐 것이 없으면 확인 간격을 watch-max-interval까지 늘리고, 바뀌거나 마감이 가까우면 watch-min-interval로 줄임
+    target 좌석이 비면 바로 신청하고 끝냄
+    """
+    min_interval = float(config.get("watch-min-interval") or 2)
+    max_interval = float(config.get("watch-max-interval") or 30)
+    interval = min_interval
+    area_info = {
+        "tables": [{"r": r, "c": c, "data": data} for r, c, data in seatmap.tables[area]],
+        "vertical": seatmap.vertical[area],
+        "count": seatmap.counts[area][1],
+    }
+
+    def render(s):
+        lines = [f"신청 현황: {format_count(*s.counts[area])}"]
+        lines += render_table(
+            s.table_data(area, highlight_seat, student_id, False), s.vertical[area]
+        ).rstrip("\n").split("\n")
+        return lines
 
-repeat = not args.command
-if repeat:
-    if not is_interactive:
-        logger.warning("인터랙티브 터미널이 아닙니다.")
-    logger.info("CTRL+C로 종료")
-passed_input = False
-while True:
+    lines = render(seatmap)
+    if is_interactive:
+        print("\n".join(lines))
     try:
-        if repeat:
-            passed_input = False
-            args = parser.parse_args(input(bold + green + "> " + reset).split())
-            passed_input = True
-        if args.command in ["auth", "a"]:
-            if args.code:
-                api.get_code(code=args.code)
+        while True:
+            if near_deadline(datetime.now()):
+                interval = min_interval
+            if is_interactive:
+                next_check = (datetime.now() + timedelta(seconds=interval)).strftime("%H:%M:%S")
+                sys.stdout.write(f"\r{grey}다음 확인: {next_check} (CTRL+C로 종료){reset}\x1b[K")
+                sys.stdout.flush()
+            sleep(interval)
+            try:
+                current = SeatMap().add_area(area, area_info, api.get_area(date, area, live=True))
+            except Exception:
+                interval = max_interval
+                continue
+            changes = diff_seats(seatmap, current)
+            if target and current.is_free(target):
+                try:
+                    api.reserve(date, target)
+                    print(("\n" if is_interactive else "") + bold + green + f"좌석 {target}에 신청했습니다." + reset)
+                    return
+                except Exception:
+                    pass
+            seatmap = current
+            if not changes:
+                interval = min(interval * 1.5, max_interval)
+                continue
+            interval = min_interval
+            if is_interactive:
+                new_lines = render(current)
+                redraw = []
+                for i, (old, new) in enumerate(zip(lines, new_lines)):
+                    if old != new:
+                        up = len(lines) - i
+                        redraw.append(f"\x1b[{up}A\r{new}\x1b[K\x1b[{up}B\r")
+                sys.stdout.write("".join(redraw))
+                lines = new_lines
             else:
-                api.get_code(browser=not args.link)
-        elif args.command in ["userinfo"]:
-            res = api.userinfo()
-            if args.field:
-                if args.field in res.keys():
-                    print(res[args.field])
+                now = datetime.now().strftime("%H:%M:%S")
+                for seat, before, after in changes:
+                    if after:
+                        name = after.get("alias") or after["name"]
+                        print(f"{now} {seat}: {name} 신청")
+                    else:
+                        name = before.get("alias") or before["name"]
+                        print(f"{now} {seat}: {name} 취소")
+                sys.stdout.flush()
+    except KeyboardInterrupt:
+        if is_interactive:
+            print()
+        logger.info("감시 종료")
+
+
+def scheduled_reserve(api, date, seats, at, parallel=False):
+    """
+    at(오늘의 HH:MM[:SS], 서버 시계 기준)에 맞춰 신청을 보냄
+    서버 시계와의 차이를 먼저 추정하고, 직전에 연결을 열어 둔 뒤 정확한 시각에 보냄
+    seats는 우선순위 순서이며 parallel이면 한꺼번에, 아니면 406(신청 불가)일 때 다음 좌석으로 넘어감
+
+    Returns:
+        str: 신청에 성공한 좌석 또는 None
+    """
+    target = datetime.combine(
+        datetime.now().date(),
+        datetime.strptime(at, "%H:%M:%S" if at.count(":") == 2 else "%H:%M").time(),
+    ).timestamp()
+    offset, error = api.clock_offset()
+    print(f"서버 시계 차이: {offset:+.3f}초 (±{error:.3f}초)")
+    fire_at = target - offset
+    if fire_at < time():
+        logger.error(f"{at}은 이미 지난 시각입니다.")
+        return None
+    warm_up = float(config.get("warm-up") or 2)
+    while fire_at - time() > warm_up:
+        if is_interactive:
+            sys.stdout.write(f"\r{grey}{at}까지 {fire_at - time():.0f}초 남음{reset}\x1b[K")
+            sys.stdout.flush()
+        sleep(min(1, fire_at - time() - warm_up))
+    if is_interactive:
+        sys.stdout.write("\r\x1b[K")
+    api.warm_up(len(seats) if parallel else 1)
+    # 잠들면 늦게 깰 수 있으므로 마지막 순간은 바쁜 대기
+    while fire_at - time() > 0.02:
+        sleep(0.005)
+    while time() < fire_at:
+        pass
+
+    def report(seat, attempt):
+        status, reason, latency = attempt
+        if status is not None and status < 400:
+            print(f"{seat}: {bold}{green}성공{reset} ({latency:.0f}ms)")
+        else:
+            print(f"{seat}: {bold}{red}실패{reset} - {reason} ({latency:.0f}ms)")
+
+    if parallel:
+        attempts = api.gather(*[(api.reserve_attempt, date, seat) for seat in seats])
+        for seat, attempt in zip(seats, attempts):
+            report(seat, attempt)
+        success = [s for s, a in zip(seats, attempts) if a[0] is not None and a[0] < 400]
+        return success[0] if success else None
+    for seat in seats:
+        attempt = api.reserve_attempt(date, seat)
+        report(seat, attempt)
+        if attempt[0] is not None and attempt[0] < 400:
+            return seat
+        if attempt[0] not in [404, 406]:
+            break
+    return None
+
+
+def batch_search(api, date, queries, refresh=False):
+    """여러 학생을 한 번에 검색해서 표 하나로 보여주고, 찾은 학생들을 구역별 좌석표에 표시함"""
+    results = api.search_many(date, queries)
+    rows = []
+    found = {}
+    for query in queries:
+        res = results[query]
+        if res == 404:
+            rows.append([query, "", "", red + "존재하지 않는 학생" + reset])
+        elif res == 422:
+            rows.append([query, "", "", yellow + "동명이인" + reset])
+        else:
+            user = res["user"]
+            name = user["name"] + (f"('{user['alias']}')" if user.get("alias") else "")
+            rows.append([query, user["student_id"], name, res["seat_name"] or "없음"])
+            if res["seat_name"]:
+                found.setdefault(res["seat_name"][:2], set()).add(res["seat_name"])
+    print(
+        tabulate.tabulate(rows, headers=["검색어", "학번", "이름", "좌석"], tablefmt="fancy_grid")
+    )
+    areas = sorted(found)
+    if not areas:
+        return
+    calls = []
+    for area in areas:
+        calls += [(api.get_space_area, area, refresh), (api.get_area, date, area)]
+    responses = api.gather(*calls)
+    seatmap = SeatMap()
+    for i, area in enumerate(areas):
+        seatmap.add_area(area, responses[2 * i], responses[2 * i + 1])
+    for area in areas:
+        print(f"\n{bold}{area}{reset}")
+        print(f"신청 현황: {format_count(*seatmap.counts[area])}")
+        process_table(seatmap, area, found[area], config.get("student-id"), False)
+
+
+def read_queries(args):
+    """-q의 쉼표 목록과 --query-file(- 이면 표준 입력)의 줄/쉼표 목록을 순서대로 중복 없이 합침"""
+    text = args.queries or ""
+    if args.query_file:
+        if args.query_file == "-":
+            text += "," + sys.stdin.read()
+        else:
+            with open(args.query_file, "r", encoding="utf-8") as f:
+                text += "," + f.read()
+    queries = [q.strip() for q in re.split(r"[,\n]", text)]
+    return list(dict.fromkeys(q for q in queries if q))
+
+
+def reserve_date(args):
+    input_date = "tomorrow" if args.command == "rt" else args.date
+    if input_date == "today":
+        return datetime.now()
+    elif input_date == "tomorrow":
+        return datetime.now() + timedelta(days=1)
+    return datetime.strptime(input_date, "%Y%m%d")
+
+
+def penalty_rows(args):
+    # 합계는 짧은 기간으로 보면 의미가 없으므로 --by는 --from이 없으면 전체 기록을 봄
+    f = args.f or ("" if args.recent or args.by else (datetime.now() - timedelta(days=7)).strftime("%Y%m%d"))
+    t = args.t or "99999999"
+    if args.by:
+        column = "giver" if args.by == "teacher" else "substr(day, 1, 6)"
+        return db.query(
+            f"SELECT {column} AS k, COUNT(*) AS n, SUM(points) AS s FROM penalties "
+            "WHERE day >= ? AND day <= ? GROUP BY k ORDER BY k",
+            (f, t),
+        )
+    return db.query(
+        "SELECT * FROM penalties WHERE day >= ? AND day <= ? ORDER BY date DESC", (f, t)
+    )
+
+
+def out_rows(args):
+    f = args.f or ("" if args.all else datetime.now().strftime("%Y%m%d"))
+    t = args.t or "99999999"
+    sql = "SELECT * FROM outrequests WHERE day >= ? AND day <= ?"
+    params = [f, t]
+    if args.category:
+        sql += " AND category = ?"
+        params.append(args.category)
+    return db.query(sql + " ORDER BY start", params)
+
+
+def write_records(args, api, writer):
+    """run과 같은 명령어를 실행하되 표/색 없이 기록을 받는 대로 writer로 내보냄"""
+    if args.command in ["userinfo"]:
+        res = api.userinfo()
+        writer.write({args.field: res.get(args.field)} if args.field else res)
+    elif args.command in ["penalty", "p"]:
+        if args.sync or db.get_meta("penalties-synced") is None:
+            api.sync_penalties()
+        if args.only_points:
+            writer.write({"total": int(db.get_meta("penalties-total") or 0)})
+        elif args.by:
+            for r in penalty_rows(args):
+                writer.write({args.by: r["k"], "count": r["n"], "points": r["s"]})
+        else:
+            for r in penalty_rows(args):
+                writer.write({k: r[k] for k in ["day", "date", "points", "reason", "giver"]})
+    elif args.command in ["meal"]:
+        for d, data in api.iter_meals(meal_dates(args)):
+            writer.write(
+                {"date": d, "breakfast": data[0], "lunch": data[1], "dinner": data[2]}
+                if data
+                else {"date": d, "breakfast": None, "lunch": None, "dinner": None}
+            )
+    elif args.command == "update":
+        res = api.check_update()
+        writer.write({"current": version, "latest": res["version"].strip(), "update": res["update"], "download_link": res["download_link"]})
+    elif args.command in ["out", "o"]:
+        if args.new:
+            items = out_items(args)
+            results = api.create_outrequests(items)
+            for (f, t, category, reason), (ok, error) in zip(items, results):
+                writer.write({"from": f.isoformat(), "to": t.isoformat(), "category": category, "reason": reason, "ok": ok, "error": error or None})
+            if any(ok for ok, _ in results):
+                api.sync_outrequests()
+            if not all(ok for ok, _ in results):
+                exit(1)
+            return
+        if args.sync or db.get_meta("outrequests-synced") is None:
+            api.sync_outrequests()
+        for r in out_rows(args):
+            writer.write({k: r[k] for k in ["day", "start", "end", "category", "reason", "status"]})
+    elif args.command == "occupancy":
+        _, rows = occupancy_grid(args, api)
+        for r in rows:
+            writer.write({"date": r["day"], "area": r["area"], "occupied": r["occupied"], "count": r["count"]})
+    elif args.command == "stats":
+        for host, d in Requester.stats().items():
+            writer.write({"host": host, **d})
+    elif args.command in ["reserve", "r", "rt"]:
+        if args.watch:
+            logger.error("--watch는 --format과 같이 쓸 수 없습니다.")
+            exit(1)
+        date = reserve_date(args)
+        query = args.q
+        if args.queries or args.query_file:
+            queries = read_queries(args)
+            results = api.search_many(date, queries)
+            for q in queries:
+                res = results[q]
+                if isinstance(res, dict):
+                    writer.write({"query": q, "student_id": res["user"]["student_id"], "name": res["user"]["name"], "seat": res["seat_name"], "error": None})
                 else:
-                    logger.error("존재하지 않는 필드")
+                    writer.write({"query": q, "student_id": None, "name": None, "seat": None, "error": "not found" if res == 404 else "ambiguous"})
+            return
+        if not query:
+            logger.error("검색어를 입력하세요")
+            exit(1)
+        if re.match(r"^[abs]$", query):
+            if args.full:
+                _, seatmap = api.full_room(date, query, args.refresh)
+                for area in seatmap.tables:
+                    write_seats(writer, seatmap, area)
+                return
+            room_info, room_reserve_info = api.gather(
+                (api.get_space_room, query, args.refresh),
+                (api.get_room, date, query),
+            )
+            for area, (occupied, count) in SeatMap.from_room(room_info, room_reserve_info).counts.items():
+                writer.write({"area": area, "occupied": occupied, "count": count})
+            return
+        if query == "me" or re.match(r"^(([가-힣]{2,5}(\d?))|([1-3]\d{3}))$", query):
+            res = api.search_me(date) if query == "me" else api.search(date, query)
+            if not res:
+                exit(1)
+            writer.write({"student_id": res["user"]["student_id"], "name": res["user"]["name"], "seat": res["seat_name"]})
+            return
+        if not re.match(r"^[abs](\d|\d{3})$", query):
+            logger.error(f"'{query}': 올바르지 않은 검색어입니다.")
+            exit(1)
+        if len(query) == 4 and args.create:
+            reason = None
+            if args.at:
+                seats = [query] + [s for s in (args.then or "").split(",") if s]
+                # 진행 상황은 기록과 섞이지 않도록 stderr로 보냄
+                with redirect_stdout(sys.stderr):
+                    seat = scheduled_reserve(api, date, seats, args.at, args.parallel)
             else:
-                print(json.dumps(res, indent=4, ensure_ascii=False))
-        elif args.command in ["penalty", "p"]:
-            res = None
-            if not args.recent:
-                res = api.penalty(
-                    (datetime.now() - timedelta(days=7)).strftime("%Y%m%d")
-                )
+                status, reason, _ = api.reserve_attempt(date, query)
+                seat = query if status is not None and status < 400 else None
+            writer.write({"seat": seat, "ok": seat is not None, "error": reason})
+            if seat is None:
+                exit(1)
+            return
+        area = query[:2]
+        area_info, area_reserve_info = api.gather(
+            (api.get_space_area, area, args.refresh),
+            (api.get_area, date, area),
+        )
+        seatmap = SeatMap().add_area(area, area_info, area_reserve_info)
+        write_seats(writer, seatmap, area, query if len(query) == 4 else None)
+
+
+def write_seats(writer, seatmap, area, only=None):
+    for _, _, seats in seatmap.tables[area]:
+        for seat in seats:
+            if seat == "0" or (only and seat != only):
+                continue
+            user = seatmap.user(seat)
+            writer.write({
+                "area": area,
+                "seat": seat,
+                "free": seatmap.is_free(seat),
+                "student_id": user["student_id"] if user else None,
+                "name": seatmap.name(seat) if user else None,
+            })
+
+
+def global_options(args):
+    """REPL이나 batch의 각 줄에 물려줄 전역 옵션 값"""
+    return {key: getattr(args, key) for key in ["format", "offline", "trace", "timings"]}
+
+
+def inherit_options(args, defaults):
+    """args에서 지정하지 않은 전역 옵션을 defaults의 값으로 채움"""
+    for key, value in (defaults or {}).items():
+        if not getattr(args, key):
+            setattr(args, key, value)
+    return args
+
+
+def run(args, api):
+    """파싱된 명령어 하나를 실행함, --trace/--timings면 구간을 기록함"""
+    Requester.offline = args.offline
+    if not (args.trace or args.timings):
+        return run_command(args, api)
+    tracer.begin()
+    try:
+        with tracer.span(args.command or "", "command"):
+            return run_command(args, api)
+    finally:
+        tracer.finish(args.trace, args.timings)
+
+
+def run_command(args, api):
+    if args.format and args.command not in ["auth", "a", "daemon", "batch"]:
+        writer = RecordWriter(args.format)
+        with plain_output():
+            try:
+                write_records(args, api, writer)
+            finally:
+                writer.close()
+        return
+    if args.command in ["auth", "a"]:
+        if args.code:
+            api.get_code(code=args.code)
+        else:
+            api.get_code(browser=not args.link)
+    elif args.command in ["userinfo"]:
+        res = api.userinfo()
+        if args.field:
+            if args.field in res.keys():
+                print(res[args.field])
             else:
-                res = api.penalty()
+                logger.error("존재하지 않는 필드")
+        else:
+            print(json.dumps(res, indent=4, ensure_ascii=False))
+    elif args.command in ["penalty", "p"]:
+        if args.sync or db.get_meta("penalties-synced") is None:
+            count = api.sync_penalties()
+            logger.info(f"벌점 기록 {count}개 동기화")
+        total = int(db.get_meta("penalties-total") or 0)
+        print(
+            f"전체 벌점: {bold}{green if total<0 else (red if total>=30 else (yellow if total>=20 else ''))}{total}점"
+        )
+        print(reset, end="")
+        if args.by:
+            rows = penalty_rows(args)
             print(
-                f"전체 벌점: {bold}{green if res['total']<0 else (red if res['total']>=30 else (yellow if res['total']>=20 else ''))}{res['total']}점"
+                tabulate.tabulate(
+                    [[r["k"], r["n"], r["s"]] for r in rows],
+                    headers=["교사" if args.by == "teacher" else "월", "건수", "합계"],
+                    tablefmt="fancy_grid",
+                )
             )
-            print(reset, end="")
-            if not args.only_points:
-                print("벌점 내역:\n")
-                for d in res["data"]:
-                    try:
-                        print(
-                            f'일자: {(datetime.fromisoformat(d["date"].replace("Z", "+00:00"))+timedelta(hours=9)).strftime("%Y.%m.%d")}'
-                        )
-                        print(
-                            f'점수: {(red+"+") if d["points"]>0 else green}{d["points"]}점{reset}'
-                        )
-                        print(f"사유: {d['reason']}")
-                        print(f"부과 교사: {d['giver']['name']}")
-                        print("____________")
-                        print()
-                    except Exception:
-                        pass
-        elif args.command in ["meal"]:
-            d = None
-            if len(args.date) == 4:
-                d = str(datetime.now().year) + args.date
-            else:
-                d = args.date
-            data = api.meal(d)
+        elif not args.only_points:
+            rows = penalty_rows(args)
+            if args.f or args.t:
+                print(f"기간 합계: {bold}{sum(r['points'] for r in rows)}점{reset}")
+            print("벌점 내역:\n")
+            for d in rows:
+                print(f'일자: {datetime.strptime(d["day"], "%Y%m%d").strftime("%Y.%m.%d")}')
+                print(f'점수: {(red+"+") if d["points"]>0 else green}{d["points"]}점{reset}')
+                print(f"사유: {d['reason']}")
+                print(f"부과 교사: {d['giver']}")
+                print("____________")
+                print()
+    elif args.command in ["meal"]:
+        dates = meal_dates(args)
+        meals = api.meals(dates)
+        for d in dates:
+            data = meals[d]
+            title = datetime.strptime(d, "%Y%m%d").strftime("%Y년 %m월 %d일")
             if not data:
-                print("급식 없음")
+                print(f"{title}: 급식 없음" if len(dates) > 1 else "급식 없음")
+                if len(dates) > 1:
+                    print()
             else:
-                print(
-                    bold
-                    + datetime.strptime(d, "%Y%m%d").strftime("%Y년 %m월 %d일")
-                    + "의 급식\n"
-                    + reset
-                )
+                print(bold + title + "의 급식\n" + reset)
                 mn = ["아침", "점심", "저녁"]
                 for i in range(3):
                     print(bold + mn[i] + reset)
                     print(data[i])
                     print()
-        elif args.command == "update":
-            print(f"현재 버전: {version}")
-            res = api.check_update()
-            if res["update"] or args.force:
-                print(f'새 버전: {res["version"]}')
-                if args.pull:
-                    file_path = os.path.dirname(os.path.realpath(__file__))
-                    print(f'git -C "{file_path}" pull')
-                    os.system(f'git -C "{file_path}" pull')
-                    exit(0)
-                print(f'다운로드 링크: {res["download_link"]}')
-            else:
-                print("최신 버전입니다.")
-                config.set("update-checked", datetime.now().strftime("%Y%m%d"))
-        elif args.command in ["reserve", "r", "rt"]:
-            logger.warning("지원이 일시 중단되었습니다. 이 명령어는 실패할 것입니다.")
-            query = args.q
-            input_date = "tomorrow" if args.command == "rt" else args.date
-            date = datetime.now()
-            if input_date == "today":
-                date = datetime.now()
-            elif input_date == "tomorrow":
-                date = datetime.now() + timedelta(days=1)
+    elif args.command == "update":
+        print(f"현재 버전: {version}")
+        res = api.check_update()
+        if res["update"] or args.force:
+            print(f'새 버전: {res["version"]}')
+            if args.pull:
+                file_path = os.path.dirname(os.path.realpath(__file__))
+                print(f'git -C "{file_path}" pull')
+                os.system(f'git -C "{file_path}" pull')
+                exit(0)
+            print(f'다운로드 링크: {res["download_link"]}')
+        else:
+            print("최신 버전입니다.")
+            config.set("update-checked", datetime.now().strftime("%Y%m%d"))
+    elif args.command in ["out", "o"]:
+        if args.new:
+            items = out_items(args)
+            results = api.create_outrequests(items)
+            print(
+                tabulate.tabulate(
+                    [
+                        [
+                            f"{f.strftime('%Y.%m.%d %H:%M')} ~ {t.strftime('%H:%M')}",
+                            f"{green}신청됨{reset}" if ok else f"{red}실패{reset}",
+                            reason,
+                        ]
+                        for (f, t, _, _), (ok, reason) in zip(items, results)
+                    ],
+                    headers=["시간", "결과", "사유"],
+                    tablefmt="fancy_grid",
+                )
+            )
+            succeeded = sum(ok for ok, _ in results)
+            print(f"{succeeded}/{len(results)}개 신청")
+            if succeeded:
+                api.sync_outrequests()
+            if succeeded < len(results):
+                exit(1)
+            return
+        if args.sync or db.get_meta("outrequests-synced") is None:
+            count = api.sync_outrequests()
+            logger.info(f"외출 기록 {count}개 동기화")
+        rows = out_rows(args)
+        if not rows:
+            print("외출 기록이 없습니다.")
+        else:
+            print(
+                tabulate.tabulate(
+                    [
+                        [r["start"].replace("-", "."), r["end"][11:] if r["end"][:10] == r["start"][:10] else r["end"].replace("-", "."), r["category"] or "", r["reason"] or "", r["status"] or ""]
+                        for r in rows
+                    ],
+                    headers=["시작", "끝", "분류", "사유", "상태"],
+                    tablefmt="fancy_grid",
+                )
+            )
+    elif args.command == "occupancy":
+        days, rows = occupancy_grid(args, api)
+        if args.csv:
+            write_occupancy_csv(args.csv, rows)
+            if args.csv == "-":
+                return
+        print(render_heatmap(days, rows))
+    elif args.command == "stats":
+        stats = Requester.stats()
+        if not stats:
+            print("아직 연결한 서버가 없습니다.")
+        for host, d in stats.items():
+            print(
+                f"{bold}{host}{reset}: 요청 {d['requests']}회, 새 연결 {d['connections']}개, 재사용 {bold}{d['reused']}{reset}회"
+            )
+    elif args.command == "batch":
+        run_batch(build_parser(), api, args)
+    elif args.command == "daemon":
+        if args.stop:
+            stop_daemon()
+        else:
+            serve_daemon(api)
+    elif args.command in ["reserve", "r", "rt"]:
+        logger.warning("지원이 일시 중단되었습니다. 이 명령어는 실패할 것입니다.")
+        query = args.q
+        date = reserve_date(args)
+        if args.queries or args.query_file:
+            batch_search(api, date, read_queries(args), args.refresh)
+            return
+        if not query:
+            logger.error("검색어를 입력하세요")
+            return
+        if re.match(r"^[abs]$", query):
+            if args.full:
+                room_info, seatmap = api.full_room(date, query, args.refresh)
             else:
-                date = datetime.strptime(input_date, "%Y%m%d")
-            if re.match(r"^[abs]$", query):
-                room_info = api.get_space_room(query)
-                room_reserve_info = api.get_room(date, query)
-                print(f"{bold}{query}({room_info['description']}){reset}")
-                if query in ["a", "b"] and is_interactive:
-                    try:
-                        from imgcat import imgcat
-                        from PIL import Image
-
-                        img = None
-                        with Loader("이미지 다운로드 중...") as loader:
-                            img = Image.open(
-                                requests.get(
-                                    base_address + query + "_labeled.png", stream=True
-                                ).raw
-                            )
-                        imgcat(img)
-                        print("")
-                    except Exception:
-                        pass
-                for i in range(len(room_info["areas"])):
-                    print(f"{room_info['areas'][i]['area_name']}: ", end="")
-                    seat_count = room_info["areas"][i]["count"]
-                    seat_occupied = room_reserve_info["areas"][i]["occupied"]
+                room_info, room_reserve_info = api.gather(
+                    (api.get_space_room, query, args.refresh),
+                    (api.get_room, date, query),
+                )
+                seatmap = SeatMap.from_room(room_info, room_reserve_info)
+            print(f"{bold}{query}({room_info['description']}){reset}")
+            if query in ["a", "b"] and is_interactive:
+                try:
+                    from imgcat import imgcat
+
+                    imgcat(api.room_image(query))
+                    print("")
+                except Exception:
+                    pass
+            if args.full:
+                print(render_room(seatmap, config.get("student-id")), end="")
+                return
+            for area, (seat_occupied, seat_count) in seatmap.counts.items():
+                print(f"{area}: {format_count(seat_occupied, seat_count)}")
+        else:
+            searched = None
+            if query == "me" or re.match(
+                r"^(([가-힣]{2,5}(\d?))|([1-3]\d{3}))$", query
+            ):
+                res = {}
+                if query == "me":
+                    res = api.search_me(date)
+                else:
+                    res = api.search(date, query)
+                if not res:
+                    print("오류")
+                    query = ""
+                else:
                     print(
-                        f"{bold}{yellow if seat_count>seat_occupied else red}{seat_occupied}{reset}/{bold}{seat_count}{reset}"
+                        f"{bold}{res['user']['student_id']} {res['user']['name']}",
+                        end="",
                     )
-            else:
-                if query == "me" or re.match(
-                    r"^(([가-힣]{2,5}(\d?))|([1-3]\d{3}))$", query
-                ):
-                    res = {}
-                    if query == "me":
-                        res = api.search_me(date)
-                    else:
-                        res = api.search(date, query)
-                    if not res:
-                        print("오류")
-                        query = ""
-                    else:
-                        print(
-                            f"{bold}{res['user']['student_id']} {res['user']['name']}",
-                            end="",
-                        )
-                        if "alias" in res["user"].keys():
-                            print(f"('{res['user']['alias']}')", end="")
-                        print(reset)
-                        print(
-                            f"신청 좌석: {bold}{res['seat_name'] if res['seat_name'] else '없음'}{reset}"
-                        )
-                        query = res["seat_name"] or ""
-                if re.match(r"^[abs](\d|\d{3})$", query):
-                    highlight_seat = ""
-                    if len(query) == 4:
-                        if args.create:
-                            try:
-                                res = api.reserve(date, query)
-                                print(bold + green + f"좌석 {query}에 신청했습니다." + reset)
-                            except Exception:
-                                pass
-                        highlight_seat = query
-                        query = query[:2]
-
-                    area_info = api.get_space_area(query)
-                    area_reserve_info = api.get_area(date, query)
-                    seat_count = area_info["count"]
-                    seat_occupied = 0
-                    if area_reserve_info:
-                        seat_occupied = area_reserve_info["occupied"]
-                    print(f"{bold}{query}{reset}")
-
-                    print("신청 현황: ", end="")
+                    if "alias" in res["user"].keys():
+                        print(f"('{res['user']['alias']}')", end="")
+                    print(reset)
                     print(
-                        f"{bold}{yellow if seat_count>seat_occupied else red}{seat_occupied}{reset}/{bold}{seat_count}{reset}"
+                        f"신청 좌석: {bold}{res['seat_name'] if res['seat_name'] else '없음'}{reset}"
                     )
-                    process_table(
-                        area_info,
-                        area_reserve_info,
+                    query = res["seat_name"] or ""
+                    searched = res["user"]["student_id"]
+            if re.match(r"^[abs](\d|\d{3})$", query):
+                highlight_seat = ""
+                target = None
+                if len(query) == 4:
+                    if args.create and args.at:
+                        seats = [query] + [s for s in (args.then or "").split(",") if s]
+                        for seat in seats:
+                            if not re.match(r"^[abs]\d{3}$", seat):
+                                logger.error(f"'{seat}': 올바르지 않은 좌석입니다.")
+                                return
+                        query = scheduled_reserve(api, date, seats, args.at, args.parallel) or query
+                    elif args.create:
+                        try:
+                            res = api.reserve(date, query)
+                            print(bold + green + f"좌석 {query}에 신청했습니다." + reset)
+                        except Exception:
+                            target = query
+                    highlight_seat = query
+                    query = query[:2]
+
+                area_info, area_reserve_info = api.gather(
+                    (api.get_space_area, query, args.refresh),
+                    (api.get_area, date, query),
+                )
+                seatmap = SeatMap().add_area(query, area_info, area_reserve_info)
+                if searched is not None:
+                    highlight_seat = seatmap.seat_of(searched) or highlight_seat
+                print(f"{bold}{query}{reset}")
+                if args.watch:
+                    watch_area(
+                        api,
+                        date,
+                        query,
+                        seatmap,
                         highlight_seat,
                         config.get("student-id"),
-                        False,
+                        target,
                     )
-                elif len(query):
-                    logger.error(f"'{query}': 올바르지 않은 검색어입니다.")
-        else:
+                    return
+                print(f"신청 현황: {format_count(*seatmap.counts[query])}")
+                process_table(
+                    seatmap,
+                    query,
+                    highlight_seat,
+                    config.get("student-id"),
+                    False,
+                )
+            elif len(query):
+                logger.error(f"'{query}': 올바르지 않은 검색어입니다.")
+    else:
+        logger.error("명령어를 입력하세요")
+
+
+def start_update_check(api):
+    """마지막 확인 후 3일이 지났으면 백그라운드에서 업데이트를 확인함"""
+    result = {}
+
+    def check():
+        try:
+            checked = config.get("update-checked") or "19721121"
+            if (datetime.now() - datetime.strptime(checked, "%Y%m%d")).days > 3:
+                result.update(api.check_update())
+        except Exception:
+            pass
+
+    thread = Thread(target=check, daemon=True)
+    thread.start()
+    return thread, result
+
+
+def report_update(check):
+    """
+    확인이 끝났으면 결과를 출력하고 None 반환, 아직 진행 중이면 그대로 반환(다음 명령어 뒤에 다시 확인)
+    --format 출력이 섞이지 않도록 stderr로 출력함
+    """
+    if check is None or check[0].is_alive():
+        return check
+    result = check[1]
+    if result.get("update"):
+        print(f'새 버전: {result["version"]}', file=sys.stderr)
+        print(f'다운로드 링크: {result["download_link"]}', file=sys.stderr)
+    elif result:
+        config.set("update-checked", datetime.now().strftime("%Y%m%d"))
+    return None
+
+
+class FrameWriter(io.TextIOBase):
+    """daemon 클라이언트에게 [종류 1바이트][길이 4바이트][내용] 형식으로 출력을 보내는 스트림"""
+
+    def __init__(self, conn, kind):
+        self.conn = conn
+        self.kind = kind
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        data = s.encode("utf-8")
+        if data:
+            self.conn.sendall(self.kind + len(data).to_bytes(4, "big") + data)
+        return len(s)
+
+
+def execute(parser, api, argv, defaults=None):
+    """
+    명령어 하나를 실행하고 종료 코드를 반환함
+
+    Args:
+        defaults (dict, optional): argv에서 지정하지 않은 전역 옵션의 값(batch에서 --format 등을 물려줌)
+    """
+    try:
+        args = inherit_options(parser.parse_args(argv), defaults)
+        if not args.command:
             logger.error("명령어를 입력하세요")
+            return 1
+        run(args, api)
         config.save()
-        if not repeat:
-            exit(0)
-    except KeyboardInterrupt:
-        logger.info("\n종료")
-        exit(0)
+        save_responses()
+        return 0
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
     except Exception as e:
         print(e)
         logger.info("명령 실행 실패.")
-        if not repeat:
+        return 1
+
+
+class ThreadOutput(io.TextIOBase):
+    """스레드마다 다른 곳으로 출력을 보내는 stdout/stderr, 지정하지 않은 스레드는 원래 스트림으로 보냄"""
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def target(self):
+        return getattr(self.local, "stream", None) or self.default
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        return self.target().write(s)
+
+    def flush(self):
+        self.target().flush()
+
+
+class Capture:
+    """명령어 하나의 stdout/stderr 출력을 순서대로 모아 둠"""
+
+    def __init__(self):
+        self.chunks = []
+        self.stdout = self.Stream(self.chunks, "stdout")
+        self.stderr = self.Stream(self.chunks, "stderr")
+
+    class Stream(io.TextIOBase):
+        def __init__(self, chunks, name):
+            self.chunks = chunks
+            self.name = name
+
+        def writable(self):
+            return True
+
+        def write(self, s):
+            self.chunks.append((self.name, s))
+            return len(s)
+
+    def replay(self, stdout, stderr):
+        for name, s in self.chunks:
+            (stdout if name == "stdout" else stderr).write(s)
+        stdout.flush()
+        stderr.flush()
+
+
+# batch에서 다른 명령어와 동시에 실행해도 되는 조회 명령어
+batch_parallel_commands = ["meal", "userinfo", "penalty", "p", "out", "o", "occupancy", "stats", "reserve", "r", "rt"]
+
+
+def batch_parallel(argv, offline):
+    """
+    쓰기, 계속 실행, 입력이 필요한 명령어가 아니면 True
+
+    Args:
+        offline (bool): batch의 --offline, Requester.offline은 프로세스에 하나뿐이므로 혼자 --offline인 줄은 혼자 실행함
+    """
+    command = command_of(argv)
+    # tracer도 프로세스에 하나뿐이므로 구간을 기록하는 줄은 혼자 실행함
+    if "--trace" in argv or "--timings" in argv:
+        return False
+    if "--offline" in argv and not offline:
+        return False
+    if command not in batch_parallel_commands:
+        return False
+    if command in ["out", "o"]:
+        return not has_option(argv, "-n", "--new")
+    if command in ["reserve", "r", "rt"]:
+        return not ("--at" in argv or has_option(argv, "-c", "--create") or has_option(argv, "-w", "--watch"))
+    return True
+
+
+def read_batch(path):
+    import shlex
+
+    if path == "-":
+        text = sys.stdin.read()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            lines.append((line, shlex.split(line)))
+    return lines
+
+
+def run_batch(parser, api, args):
+    """
+    파일(- 이면 표준 입력)의 명령어를 한 줄씩 같은 Client로 실행함
+    이어진 조회 명령어들은 --jobs개씩 동시에 실행하고, 쓰기 명령어는 앞의 명령어가 모두 끝난 뒤 혼자 실행함
+    출력은 입력 순서대로 내보내고, 명령어마다 출력 뒤에 종료 코드를 stderr에 알림
+    """
+    global is_interactive
+    lines = read_batch(args.file)
+    for line, argv in lines:
+        if command_of(argv) in ["batch", "daemon"]:
+            logger.error(f"batch 안에서는 실행할 수 없는 명령어입니다: {line}")
             exit(1)
-    except SystemExit as e:
-        if not repeat or passed_input:
-            raise e
+    defaults = {"format": args.format, "offline": args.offline}
+    # 앞의 줄을 실행한 시간이 시작 구간에 섞이지 않도록 함
+    tracer.startup_reported = True
+    stdout, stderr = sys.stdout, sys.stderr
+    out, err = ThreadOutput(stdout), ThreadOutput(stderr)
+    interactive = is_interactive
+    log_stream = ch.setStream(err)
+    sys.stdout, sys.stderr = out, err
+    is_interactive = False
+
+    def job(argv):
+        capture = Capture()
+        out.local.stream, err.local.stream = capture.stdout, capture.stderr
+        try:
+            return execute(parser, api, argv, defaults), capture
+        finally:
+            out.local.stream = err.local.stream = None
+
+    codes = []
+    try:
+        workers = max(1, args.jobs or int(config.get("pool-size") or 4))
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = []
+
+            def flush():
+                for line, task in pending:
+                    code, capture = task.result()
+                    capture.replay(stdout, stderr)
+                    report(line, code)
+                pending.clear()
+
+            def report(line, code):
+                codes.append(code)
+                stderr.write(f"{red if code else grey}종료 코드 {code}: {line}{reset}\n")
+                stderr.flush()
+
+            for line, argv in lines:
+                if batch_parallel(argv, args.offline):
+                    pending.append((line, executor.submit(job, argv)))
+                    continue
+                flush()
+                code, capture = job(argv)
+                capture.replay(stdout, stderr)
+                report(line, code)
+            flush()
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+        ch.setStream(log_stream)
+        is_interactive = interactive
+    failed = sum(1 for code in codes if code)
+    if failed:
+        logger.warning(f"{len(codes)}개 중 {failed}개 실패")
+        exit(1)
+    logger.info(f"{len(codes)}개 모두 성공")
+
+
+def serve_daemon(api):
+    """
+    유닉스 소켓으로 명령어를 받아 미리 준비된 Client로 실행하고 출력을 돌려줌
+    연결 풀, 회로 차단기, 캐시가 메모리에 남아 있으므로 명령어마다 시작 비용을 내지 않음
+    명령어는 한 번에 하나씩 실행하며, 오늘 날짜 같은 기본값이 바뀌므로 parser는 명령어마다 새로 만듦
+    """
+    global is_interactive
+    import socket
+
+    if not hasattr(socket, "AF_UNIX"):
+        logger.error("이 운영체제에서는 daemon을 사용할 수 없습니다.")
+        return
+    if os.path.exists(daemon_socket_path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(daemon_socket_path)
+            logger.error("daemon이 이미 실행 중입니다.")
+            return
+        except OSError:
+            os.unlink(daemon_socket_path)
+        finally:
+            probe.close()
+    is_interactive = False
+    # daemon에서는 명령어마다 시작 비용이 없으므로 시작 구간을 기록하지 않음
+    tracer.startup_reported = True
+    lock = Lock()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                request = json.loads(self.rfile.readline())
+                if request.get("stop"):
+                    Thread(target=server.shutdown, daemon=True).start()
+                    code = 0
+                else:
+                    code = self.execute(request)
+                self.request.sendall(b"x" + len(str(code)).to_bytes(4, "big") + str(code).encode())
+            except OSError:
+                pass
+
+        def execute(self, request):
+            out = FrameWriter(self.request, b"o")
+            err = FrameWriter(self.request, b"e")
+            with lock:
+                config.reload()
+                stdin = sys.stdin
+                stream = ch.setStream(err)
+                cwd = os.getcwd()
+                try:
+                    # 명령어는 한 번에 하나씩 실행하므로 작업 폴더를 잠시 client의 것으로 바꿔도 됨
+                    os.chdir(request.get("cwd") or cwd)
+                    with redirect_stdout(out), redirect_stderr(err):
+                        sys.stdin = io.StringIO(request.get("stdin", ""))
+                        return execute(build_parser(), api, request["argv"])
+                finally:
+                    os.chdir(cwd)
+                    sys.stdin = stdin
+                    ch.setStream(stream)
+
+    os.makedirs(data_dir, exist_ok=True)
+    server = socketserver.ThreadingUnixStreamServer(daemon_socket_path, Handler)
+    server.daemon_threads = True
+    os.chmod(daemon_socket_path, 0o600)
+    logger.info(f"daemon 실행 중: {daemon_socket_path} (CTRL+C 또는 dshs daemon --stop으로 종료)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(daemon_socket_path):
+            os.unlink(daemon_socket_path)
+        config.save()
+        save_responses()
+    logger.info("daemon 종료")
+
+
+def stop_daemon():
+    import socket
+
+    if not hasattr(socket, "AF_UNIX"):
+        logger.error("이 운영체제에서는 daemon을 사용할 수 없습니다.")
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(daemon_socket_path)
+        sock.sendall(json.dumps({"stop": True}).encode() + b"\n")
+        sock.recv(16)
+        logger.info("daemon을 종료했습니다.")
+    except OSError:
+        logger.error("실행 중인 daemon이 없습니다.")
+    finally:
+        sock.close()
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    api = Client()
+    # --offline이면 업데이트 확인을 포함해 네트워크에 전혀 접근하지 않음
+    Requester.offline = args.offline
+    update_check = None if args.offline else start_update_check(api)
+    defaults = global_options(args)
+
+    repeat = not args.command
+    if repeat:
+        if not is_interactive:
+            logger.warning("인터랙티브 터미널이 아닙니다.")
+        logger.info("CTRL+C로 종료")
+    passed_input = False
+    while True:
+        try:
+            if repeat:
+                passed_input = False
+                # 자정이 지나도 기본 날짜가 오늘이 되도록 줄마다 parser를 새로 만듦
+                parser = build_parser()
+                args = inherit_options(parser.parse_args(input(bold + green + "> " + reset).split()), defaults)
+                passed_input = True
+                config.reload()
+            run(args, api)
+            Requester.wait_refreshes()
+            update_check = report_update(update_check)
+            config.save()
+            save_responses()
+            if not repeat:
+                exit(0)
+        except (KeyboardInterrupt, EOFError):
+            logger.info("\n종료")
+            config.save()
+            save_responses()
+            exit(0)
+        except Exception as e:
+            print(e)
+            logger.info("명령 실행 실패.")
+            if not repeat:
+                exit(1)
+        except SystemExit as e:
+            if not repeat or passed_input:
+                raise e
+
+
+if __name__ == "__main__":
+    main()